@@ -2,13 +2,36 @@ import os
 import re
 import random
 import json
+import base64
+import bisect
+import hashlib
+import itertools
+import queue
+import secrets
+import sqlite3
+import textwrap
+import threading
+import time
+try:
+    import fcntl
+except ImportError:  # Windows: journaled mode is single-process only
+    fcntl = None
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta
-from flask import Flask, render_template_string, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, g, jsonify, stream_with_context, send_from_directory
+from flask.sessions import SessionInterface, SecureCookieSession
 from flask_mail import Mail, Message
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from jinja2 import FunctionLoader, FileSystemBytecodeCache
+from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 
 MAX_ATTEMPTS = 5
 LOCK_TIME = timedelta(minutes=10)
+OTP_TTL = timedelta(minutes=5)
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 # Go up one directory to find the static folder
@@ -24,6 +47,63 @@ app.config['MAIL_USE_SSL'] = False
 app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'swamythk07@gmail.com')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')  # must be app password if 2FA enabled
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'swamythk07@gmail.com')
+# Storage backend: 'json' (users_db.json / tasks_db.json / admin_db.json) or 'sqlite'
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'json')
+# Kept under instance/: the committed neologin.db holds an older, unrelated schema
+app.config['SQLITE_DB_PATH'] = os.environ.get('SQLITE_DB_PATH', os.path.join(app.instance_path, 'neologin.db'))
+# JSON backend only: append changes to '<file>.log' and compact in the background
+app.config['JSON_JOURNAL'] = os.environ.get('JSON_JOURNAL', '').lower() in ('1', 'true', 'yes')
+app.config['JOURNAL_COMPACT_INTERVAL'] = float(os.environ.get('JOURNAL_COMPACT_INTERVAL', 30))  # seconds
+# Writes to the same JSON file arriving within this window share one fsync. Off (0) by
+# default: only threads of one process can join a commit, so with sync workers the wait
+# is pure latency, and outside journaled mode it is spent holding the file's lock.
+app.config['GROUP_COMMIT_WINDOW'] = float(os.environ.get('GROUP_COMMIT_WINDOW', 0))  # seconds
+# Task IDs each worker reserves at a time from the JSON backend's ID sequence
+app.config['TASK_ID_BLOCK_SIZE'] = int(os.environ.get('TASK_ID_BLOCK_SIZE', 20))
+# Password hashing runs on a bounded pool so login bursts can't tie up every worker.
+# The limits are per process, so they only come into play with threaded workers
+# (gunicorn --threads N); a sync worker never has more than one hash in flight.
+app.config['HASH_WORKERS'] = int(os.environ.get('HASH_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['HASH_QUEUE_SIZE'] = int(os.environ.get('HASH_QUEUE_SIZE', 16))
+# Hash cost is calibrated at startup to take about PASSWORD_HASH_TARGET_MS on this host,
+# unless PASSWORD_HASH_METHOD pins it (e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000')
+app.config['PASSWORD_HASH_ALGORITHM'] = os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt')
+app.config['PASSWORD_HASH_TARGET_MS'] = float(os.environ.get('PASSWORD_HASH_TARGET_MS', 150))
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', '')
+# Sign-in attempts per client IP before LOCK_TIME applies (per identifier it is MAX_ATTEMPTS).
+# Off (0) by default: behind a proxy every client shares one address unless PROXY_FIX_X_FOR
+# is set. LOGIN_THROTTLE_DB shares limiter state between workers through a SQLite file.
+app.config['LOGIN_IP_MAX_ATTEMPTS'] = int(os.environ.get('LOGIN_IP_MAX_ATTEMPTS', 0))
+app.config['LOGIN_THROTTLE_DB'] = os.environ.get('LOGIN_THROTTLE_DB', '')
+# Reverse proxies in front of the app (1 on Render) whose X-Forwarded-For is trusted
+# for request.remote_addr
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+# Server-side sessions: the cookie only carries a random id; session data lives in
+# SESSION_DB_PATH (shared by all workers) behind a per-worker LRU of SESSION_CACHE_SIZE
+app.config['SERVER_SESSIONS'] = os.environ.get('SERVER_SESSIONS', '').lower() in ('1', 'true', 'yes')
+app.config['SESSION_DB_PATH'] = os.environ.get('SESSION_DB_PATH', os.path.join(app.instance_path, 'sessions.db'))
+app.config['SESSION_CACHE_SIZE'] = int(os.environ.get('SESSION_CACHE_SIZE', 10000))
+app.config['SESSION_CACHE_TTL'] = float(os.environ.get('SESSION_CACHE_TTL', 1.0))  # seconds
+# Signed-in users' records are cached this long per worker; this worker's writes invalidate them
+app.config['PROFILE_CACHE_TTL'] = float(os.environ.get('PROFILE_CACHE_TTL', 2.0))  # seconds
+# Password-reset OTPs and lockouts, shared by all workers so an OTP issued by one is
+# accepted by another; an empty OTP_STORE_PATH keeps them in memory per worker
+app.config['OTP_STORE_PATH'] = os.environ.get(
+    'OTP_STORE_PATH', os.path.join(app.instance_path, 'otp_store.json'))
+# Spent password-reset links, shared by all workers so a replay is refused everywhere
+app.config['RESET_TOKEN_STORE_PATH'] = os.environ.get(
+    'RESET_TOKEN_STORE_PATH', os.path.join(app.instance_path, 'used_reset_tokens.json'))
+# Outgoing mail is queued and sent by a background thread over a reused SMTP connection
+app.config['MAIL_QUEUE_SIZE'] = int(os.environ.get('MAIL_QUEUE_SIZE', 1000))
+app.config['MAIL_BATCH_SIZE'] = int(os.environ.get('MAIL_BATCH_SIZE', 20))
+app.config['MAIL_MAX_RETRIES'] = int(os.environ.get('MAIL_MAX_RETRIES', 5))
+app.config['MAIL_IDLE_TIMEOUT'] = float(os.environ.get('MAIL_IDLE_TIMEOUT', 30))  # seconds
+# Large inline <style>/<script> blocks are served as content-hashed files from
+# static/bundles so browsers cache them instead of re-downloading them on every page
+app.config['STATIC_BUNDLES'] = os.environ.get('STATIC_BUNDLES', '1').lower() in ('1', 'true', 'yes')
+
+if app.config['PROXY_FIX_X_FOR']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 
 mail = Mail(app)
 
@@ -35,56 +115,779 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 users = {}
 
+# ================= SHARED HELPERS =================
+def sqlite_connection(local, path):
+    """This thread's connection to the SQLite file at path, kept in `local`.
+
+    Autocommit mode (writes are grouped with explicit BEGIN IMMEDIATE) and
+    WAL, so readers in other workers are never blocked by a writer.
+    """
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        local.conn = conn
+    return conn
+
+def metrics_response(metrics):
+    """Admin-only plain-text 'name value' lines for a /metrics route."""
+    if not session.get("logged_in") or not session.get("is_admin"):
+        return redirect(url_for("signin"))
+    lines = [f"{name} {value}" for name, value in metrics().items()]
+    return "\n".join(lines) + "\n", 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+# ================= PASSWORD HASHING =================
+class HashQueueFull(Exception):
+    """Raised when the hashing queue is full; answered with a 503."""
+
+class HashExecutor:
+    """Bounded thread pool for password hashing.
+
+    hashlib's scrypt/pbkdf2 release the GIL, so hashes run in parallel with
+    other requests. At most `workers` hashes run at once and `max_queue`
+    more may wait; beyond that submit() fails fast with HashQueueFull.
+    The limits are per process: they only bite when a process serves
+    requests on several threads (gunicorn's gthread worker).
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _run(self, submitted, fn, args):
+        waited = time.monotonic() - submitted
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def _ensure_pool(self):
+        # One pool per process: gunicorn --preload forks after the startup
+        # admin hash, and the parent's pool threads don't exist in the child
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hash')
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+                self.queued = self.running = 0
+            return self._pool
+
+    def _enqueue(self, fn, args):
+        pool = self._ensure_pool()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashQueueFull()
+        with self._lock:
+            self.queued += 1
+        return pool.submit(self._run, time.monotonic(), fn, args)
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the pool and return its result."""
+        return self._enqueue(fn, args).result()
+
+    def submit_background(self, fn, *args):
+        """Queue fn(*args) without waiting. Returns False if the queue is full."""
+        try:
+            self._enqueue(fn, args)
+            return True
+        except HashQueueFull:
+            return False
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'hash_workers': self.workers,
+                'hash_queue_limit': self.max_queue,
+                'hash_queue_depth': self.queued,
+                'hash_running': self.running,
+                'hash_completed_total': self.completed,
+                'hash_rejected_total': self.rejected,
+                'hash_wait_seconds_total': round(self.wait_total, 6),
+                'hash_wait_seconds_max': round(self.wait_max, 6),
+            }
+
+# werkzeug's own defaults; calibration never goes below them
+SCRYPT_DEFAULT_N = 2 ** 15
+HASH_METHOD_FILE = os.path.join(app.instance_path, 'password_hash_method.json')
+
+def calibrate_hash_method(algorithm, target_ms):
+    """Pick hash parameters that take about target_ms on this host.
+
+    Times the best of three cheap hashes and scales it; scrypt and pbkdf2
+    cost both grow linearly in N / iterations. Results are clamped between
+    werkzeug's defaults and an upper bound.
+    """
+    def sample_ms(method):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            generate_password_hash('calibration', method=method)
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    if algorithm == 'pbkdf2':
+        sample = 20000
+        elapsed_ms = sample_ms(f'pbkdf2:sha256:{sample}')
+        iterations = int(sample * target_ms / max(elapsed_ms, 0.001)) // 10000 * 10000
+        lowest = DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:sha256:{min(max(iterations, lowest), max(2000000, lowest))}'
+    sample = 2 ** 13
+    elapsed_ms = sample_ms(f'scrypt:{sample}:8:1')
+    n = SCRYPT_DEFAULT_N
+    while n < 2 ** 17 and elapsed_ms * (2 * n) / sample <= target_ms:
+        n *= 2
+    return f'scrypt:{n}:8:1'
+
+def load_hash_method(algorithm, target_ms):
+    """Calibrate once per host and keep the result in HASH_METHOD_FILE.
+
+    Workers booting together would otherwise time their hash under
+    different load, pick different costs and rehash users back and forth.
+    The first worker calibrates under an flock; the others wait and reuse
+    its result, as do later restarts with the same settings.
+    """
+    lock_file = None
+    try:
+        lock_file = open(HASH_METHOD_FILE + '.lock', 'a')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(HASH_METHOD_FILE, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('algorithm') == algorithm and saved.get('target_ms') == target_ms:
+                return saved['method']
+        except (OSError, ValueError, KeyError):
+            pass
+        method = calibrate_hash_method(algorithm, target_ms)
+        temp_path = f"{HASH_METHOD_FILE}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'algorithm': algorithm, 'target_ms': target_ms, 'method': method}, f)
+        os.replace(temp_path, HASH_METHOD_FILE)
+        return method
+    except OSError as e:
+        print(f"Error saving calibrated hash method: {e}")
+        return calibrate_hash_method(algorithm, target_ms)
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+def hash_cost(method):
+    """(algorithm, cost) of a werkzeug method string such as 'scrypt:32768:8:1'."""
+    parts = method.split(':')
+    try:
+        if parts[0] == 'scrypt':
+            return 'scrypt', int(parts[1]) if len(parts) > 1 else SCRYPT_DEFAULT_N
+        if parts[0] == 'pbkdf2':
+            digest = parts[1] if len(parts) > 1 else 'sha256'
+            return f'pbkdf2:{digest}', int(parts[2]) if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS
+    except ValueError:
+        pass
+    return parts[0], None
+
+HASH_METHOD = app.config['PASSWORD_HASH_METHOD'] or load_hash_method(
+    app.config['PASSWORD_HASH_ALGORITHM'], app.config['PASSWORD_HASH_TARGET_MS']
+)
+hasher = HashExecutor(app.config['HASH_WORKERS'], app.config['HASH_QUEUE_SIZE'])
+
+def hash_password(password):
+    """Hash a password on the hashing pool."""
+    return hasher.submit(generate_password_hash, password, HASH_METHOD)
+
+def needs_rehash(password_hash):
+    """True if a stored hash is weaker than HASH_METHOD.
+
+    A hash is upgraded when it uses another algorithm or a lower cost, never
+    to a lower cost, so a stronger existing hash is left alone.
+    """
+    algorithm, cost = hash_cost(password_hash.split('$', 1)[0])
+    current_algorithm, current_cost = hash_cost(HASH_METHOD)
+    if algorithm != current_algorithm:
+        return True
+    return cost is not None and current_cost is not None and cost < current_cost
+
+def rehash_password_later(username, old_hash, password):
+    """Upgrade a user's stored hash in the background after a good login.
+
+    Skipped when the hashing queue is busy; the next login retries. The
+    write only lands if the password was not changed in the meantime.
+    """
+    def upgrade():
+        new_hash = generate_password_hash(password, HASH_METHOD)
+        update_user(username, lambda user: {'password': new_hash} if user.get('password') == old_hash else None)
+    return hasher.submit_background(upgrade)
+
+def verify_password(password_hash, password):
+    """Check a password against its hash on the hashing pool."""
+    return hasher.submit(check_password_hash, password_hash, password)
+
+@app.errorhandler(HashQueueFull)
+def hash_queue_full(e):
+    return "Server is busy, please try again in a moment.", 503, {'Retry-After': '1'}
+
+@app.route("/metrics/hashing")
+def hashing_metrics():
+    return metrics_response(hasher.metrics)
+
+# ================= LOGIN THROTTLING =================
+class LoginThrottle:
+    """Token buckets for sign-in attempts, keyed by identifier and client IP.
+
+    Every attempt takes a token from both buckets; a successful login gives
+    them back. A bucket holds `capacity` tokens and refills completely over
+    lock_time. When it runs dry the key is locked until lock_time has
+    passed, which is a single comparison on later attempts. The IP bucket
+    is only used when ip_capacity is set, and a locked IP still lets a
+    correct password through (see attempt()).
+    """
+
+    def __init__(self, capacity, ip_capacity, lock_time, max_keys=100000):
+        self.capacity = capacity
+        self.ip_capacity = ip_capacity
+        self.lock_time = lock_time.total_seconds()
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, updated, locked_until]
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.lockouts = 0
+        self.successes = 0
+
+    def _transact(self, fn):
+        """Run fn(get, put) atomically against the bucket table."""
+        def put(key, bucket):
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        with self._lock:
+            return fn(self._buckets.get, put)
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _keys(self, identifier, ip):
+        # login_key() so every spelling of the same email/mobile shares a bucket
+        keys = [('id:' + (login_key(identifier) or ''), self.capacity)]
+        if self.ip_capacity and ip:
+            keys.append(('ip:' + ip, self.ip_capacity))
+        return keys
+
+    def attempt(self, identifier, ip):
+        """Take a token for a sign-in attempt.
+
+        Returns (wait, ip_wait): the seconds until the identifier is
+        unlocked (0 if the attempt may go ahead) and the seconds until the
+        IP is unlocked. An attempt from a locked IP still goes ahead so a
+        correct password can sign in; only a failed one is refused.
+        """
+        now = time.time()
+        lockouts = []
+
+        def take(get, put):
+            buckets = []
+            ip_wait = 0
+            for key, capacity in self._keys(identifier, ip):
+                is_ip = key.startswith('ip:')
+                tokens, updated, locked_until = get(key) or (capacity, now, 0)
+                if now < locked_until:
+                    if is_ip:
+                        ip_wait = locked_until - now
+                        continue
+                    return locked_until - now, 0
+                tokens = min(capacity, tokens + (now - updated) * capacity / self.lock_time)
+                if tokens < 1:
+                    put(key, [tokens, now, now + self.lock_time])
+                    lockouts.append(key)
+                    if is_ip:
+                        ip_wait = self.lock_time
+                        continue
+                    return self.lock_time, 0
+                buckets.append((key, [tokens - 1, now, 0]))
+            for key, bucket in buckets:
+                put(key, bucket)
+            return 0, ip_wait
+
+        wait, ip_wait = self._transact(take)
+        if lockouts:
+            self._count('lockouts')
+        self._count('rejected' if wait else 'allowed')
+        return wait, ip_wait
+
+    def succeeded(self, identifier, ip):
+        """Refill the identifier's bucket and return the IP's token."""
+        now = time.time()
+        (id_key, capacity), *ip_keys = self._keys(identifier, ip)
+
+        def refund(get, put):
+            put(id_key, [capacity, now, 0])
+            for ip_key, ip_capacity in ip_keys:
+                bucket = get(ip_key)
+                if bucket and now >= bucket[2]:
+                    put(ip_key, [min(ip_capacity, bucket[0] + 1), bucket[1], 0])
+
+        self._transact(refund)
+        self._count('successes')
+
+    def metrics(self):
+        with self._counter_lock:
+            return {
+                'login_attempts_allowed_total': self.allowed,
+                'login_attempts_rejected_total': self.rejected,
+                'login_lockouts_total': self.lockouts,
+                'login_successes_total': self.successes,
+            }
+
+class SqliteLoginThrottle(LoginThrottle):
+    """LoginThrottle whose buckets live in a SQLite file shared by all workers."""
+
+    def __init__(self, path, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            'CREATE TABLE IF NOT EXISTS login_buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL, updated REAL, locked_until REAL)'
+        )
+
+    def _conn(self):
+        return sqlite_connection(self._local, self.path)
+
+    def _transact(self, fn):
+        conn = self._conn()
+
+        def get(key):
+            row = conn.execute(
+                'SELECT tokens, updated, locked_until FROM login_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            return list(row) if row else None
+
+        def put(key, bucket):
+            conn.execute('INSERT OR REPLACE INTO login_buckets VALUES (?, ?, ?, ?)', (key, *bucket))
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(get, put)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+if app.config['LOGIN_THROTTLE_DB']:
+    login_throttle = SqliteLoginThrottle(
+        app.config['LOGIN_THROTTLE_DB'], MAX_ATTEMPTS, app.config['LOGIN_IP_MAX_ATTEMPTS'], LOCK_TIME
+    )
+else:
+    login_throttle = LoginThrottle(MAX_ATTEMPTS, app.config['LOGIN_IP_MAX_ATTEMPTS'], LOCK_TIME)
+
+@app.route("/metrics/login")
+def login_metrics():
+    return metrics_response(login_throttle.metrics)
+
+# ================= SERVER-SIDE SESSIONS =================
+class ServerSession(SecureCookieSession):
+    """Session dict identified by a random id instead of signed contents."""
+
+    def __init__(self, initial=None, sid=None):
+        super().__init__(initial)
+        self.sid = sid
+
+class SessionStore:
+    """Session id -> session data, in SQLite with an in-memory LRU in front.
+
+    Every change is written through to SQLite, so all workers share
+    sessions and a revocation deletes them for everyone. Cached entries are
+    trusted for `ttl` seconds before being re-read, which bounds how long
+    another worker may keep serving a revoked session.
+    """
+
+    def __init__(self, path, max_entries, ttl):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache = OrderedDict()  # sid -> (loaded_at, username, data, expires)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_purge = 0
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                sid TEXT PRIMARY KEY,
+                username TEXT,
+                data TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_username ON sessions (username);
+        """)
+
+    def _conn(self):
+        return sqlite_connection(self._local, self.path)
+
+    def _remember(self, sid, entry):
+        with self._lock:
+            self._cache[sid] = entry
+            self._cache.move_to_end(sid)
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def get(self, sid):
+        """Return the data stored for sid, or None if it is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(sid)
+            if entry is not None:
+                self._cache.move_to_end(sid)
+        if entry is None or now - entry[0] > self.ttl:
+            row = self._conn().execute(
+                'SELECT username, data, expires FROM sessions WHERE sid = ?', (sid,)).fetchone()
+            if row is None:
+                with self._lock:
+                    self._cache.pop(sid, None)
+                return None
+            entry = (now, row[0], json.loads(row[1]), row[2])
+            self._remember(sid, entry)
+        if entry[3] < now:
+            self.delete(sid)
+            return None
+        return dict(entry[2])
+
+    def save(self, sid, data, expires):
+        username = data.get('username')
+        self._conn().execute(
+            'INSERT OR REPLACE INTO sessions (sid, username, data, expires) VALUES (?, ?, ?, ?)',
+            (sid, username, json.dumps(data, ensure_ascii=False), expires))
+        self._remember(sid, (time.time(), username, dict(data), expires))
+        self._purge_expired()
+
+    def delete(self, sid):
+        self._conn().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def revoke_user(self, username):
+        """Delete every session signed in as username. Returns how many."""
+        deleted = self._conn().execute('DELETE FROM sessions WHERE username = ?', (username,)).rowcount
+        with self._lock:
+            for sid in [sid for sid, entry in self._cache.items() if entry[1] == username]:
+                del self._cache[sid]
+        return deleted
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self._conn().execute('DELETE FROM sessions WHERE expires < ?', (now,))
+
+class ServerSessionInterface(SessionInterface):
+    """Keeps Flask sessions in a SessionStore; the cookie holds only the id."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not self.should_set_cookie(app, session):
+            return
+        expires = time.time() + app.permanent_session_lifetime.total_seconds()
+        self.store.save(session.sid, dict(session), expires)
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+session_store = None
+if app.config['SERVER_SESSIONS']:
+    session_store = SessionStore(
+        app.config['SESSION_DB_PATH'], app.config['SESSION_CACHE_SIZE'], app.config['SESSION_CACHE_TTL']
+    )
+    app.session_interface = ServerSessionInterface(session_store)
+
+def rotate_session_id():
+    """Move the current session to a fresh id; called on sign-in against fixation."""
+    if session_store is None:
+        return
+    session_store.delete(session.sid)
+    session.sid = secrets.token_urlsafe(32)
+    session.modified = True
+
+def revoke_user_sessions(username):
+    """Sign a user out everywhere (server-side sessions only)."""
+    if session_store is None:
+        return 0
+    return session_store.revoke_user(username)
+
+@app.route("/revoke-sessions/<user_id>")
+def revoke_sessions(user_id):
+    if not session.get("logged_in") or not session.get("is_admin"):
+        return redirect(url_for("signin"))
+    revoke_user_sessions(user_id)
+    return redirect(url_for("view_users"))
+
+# ================= MAIL QUEUE =================
+class MailQueue:
+    """Outbound mail sent from a background thread instead of the request.
+
+    The sender keeps one SMTP connection open while there is mail to send
+    (closing it after idle_timeout), sends up to batch_size queued messages
+    per wake-up, and retries a failed message with exponential backoff on a
+    fresh connection. Lag is the time from enqueue to hand-off to SMTP.
+    """
+
+    def __init__(self, app, mail, max_size, batch_size, max_retries, idle_timeout, backoff=1.0):
+        self.app = app
+        self.mail = mail
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self.backoff = backoff
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.dropped = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+
+    def _ensure_sender(self):
+        # One sender per process; gunicorn forks after import
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True, name='mail-sender').start()
+
+    def send(self, message):
+        """Queue a flask_mail Message. Returns False if the queue is full."""
+        self._ensure_sender()
+        try:
+            self._queue.put_nowait((time.monotonic(), message))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            print(f"Error queueing mail to {message.recipients}: queue full")
+            return False
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.__exit__(None, None, None)
+            except Exception:
+                pass  # Already broken; a new connection is opened next time
+            self._connection = None
+
+    def _deliver(self, enqueued, message):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._connection is None:
+                    self._connection = self.mail.connect().__enter__()
+                self._connection.send(message)
+                lag = time.monotonic() - enqueued
+                with self._lock:
+                    self.sent += 1
+                    self.lag_last = lag
+                    self.lag_max = max(self.lag_max, lag)
+                return
+            except Exception as e:
+                self._close()
+                if attempt == self.max_retries:
+                    print(f"Error sending mail to {message.recipients}: {e}")
+                    with self._lock:
+                        self.failed += 1
+                    return
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=self.idle_timeout)]
+                except queue.Empty:
+                    self._close()  # Don't hold an idle SMTP session open
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for enqueued, message in batch:
+                    self._deliver(enqueued, message)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'mail_queue_depth': self._queue.qsize(),
+                'mail_sent_total': self.sent,
+                'mail_failed_total': self.failed,
+                'mail_retries_total': self.retries,
+                'mail_dropped_total': self.dropped,
+                'mail_lag_seconds_last': round(self.lag_last, 6),
+                'mail_lag_seconds_max': round(self.lag_max, 6),
+            }
+
+mail_queue = MailQueue(
+    app, mail, app.config['MAIL_QUEUE_SIZE'], app.config['MAIL_BATCH_SIZE'],
+    app.config['MAIL_MAX_RETRIES'], app.config['MAIL_IDLE_TIMEOUT']
+)
+
+def send_mail_async(subject, recipients, body):
+    """Queue a plain-text email; returns immediately."""
+    return mail_queue.send(Message(subject, recipients=recipients, body=body))
+
+@app.route("/metrics/mail")
+def mail_metrics():
+    return metrics_response(mail_queue.metrics)
+
 # ================= ADMIN DATABASE FUNCTIONS =================
-def load_admin():
-    """Load admin credentials from JSON file."""
-    admin_file = os.path.join(basedir, ADMIN_DB_FILE)
-    if not os.path.exists(admin_file):
-        # Create default admin if file doesn't exist
-        default_admin = {
-            'email': 'swamythk07@gmail.com',
-            'password': generate_password_hash('Admin@123'),
-            'created_at': datetime.utcnow().isoformat()
-        }
-        save_admin(default_admin)
-        return default_admin
-    
+ADMIN_PLACEHOLDER_HASH = 'scrypt:32768:8:1$default$default'
+
+def _read_admin():
+    """Read the stored admin record, or None if there is none."""
     try:
-        with open(admin_file, 'r', encoding='utf-8') as f:
-            admin_data = json.load(f)
-            # Ensure password is hashed (if it's plain text or placeholder, hash it)
-            admin_password = admin_data.get('password', '')
-            if not admin_password or admin_password == 'scrypt:32768:8:1$default$default' or not (
-                admin_password.startswith('$2b$') or
-                admin_password.startswith('$2a$') or
-                admin_password.startswith('pbkdf2:') or
-                admin_password.startswith('scrypt:')
-            ):
-                # Password is not properly hashed, hash it now
-                admin_data['password'] = generate_password_hash('Admin@123')
-                save_admin(admin_data)
-            return admin_data
+        if sqlite_storage:
+            return sqlite_storage.load_admin()
+        admin_file = os.path.join(basedir, ADMIN_DB_FILE)
+        if os.path.exists(admin_file):
+            with open(admin_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
     except Exception as e:
         print(f"Error loading admin: {e}")
-        # Create default admin on error
-        default_admin = {
+    return None
+
+def _bootstrap_admin(admin_data):
+    """Create the default admin or hash a placeholder/plain-text password."""
+    if admin_data is None:
+        # Create default admin if none is stored (or it could not be read)
+        admin_data = {
             'email': 'swamythk07@gmail.com',
-            'password': generate_password_hash('Admin@123'),
+            'password': hash_password('Admin@123'),
             'created_at': datetime.utcnow().isoformat()
         }
-        save_admin(default_admin)
-        return default_admin
+        save_admin(admin_data)
+        return admin_data
+
+    # Ensure password is hashed (if it's plain text or placeholder, hash it)
+    admin_password = admin_data.get('password', '')
+    if not admin_password or admin_password == ADMIN_PLACEHOLDER_HASH:
+        admin_data['password'] = hash_password('Admin@123')
+        save_admin(admin_data)
+    elif not (
+        admin_password.startswith('$2b$') or
+        admin_password.startswith('$2a$') or
+        admin_password.startswith('pbkdf2:') or
+        admin_password.startswith('scrypt:')
+    ):
+        admin_data['password'] = hash_password(admin_password)
+        save_admin(admin_data)
+    return admin_data
+
+class AdminRecord:
+    """The admin record, bootstrapped once and kept in memory.
+
+    It is re-read only when the stat() stamp of its file changes (for
+    SQLite, of the database and its WAL), so a lookup costs a stat call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._data = None
+
+    def _file_stamp(self):
+        if sqlite_storage:
+            paths = [sqlite_storage.path, sqlite_storage.path + '-wal']
+        else:
+            paths = [os.path.join(basedir, ADMIN_DB_FILE)]
+        stamp = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def get(self):
+        if self._data is not None and self._file_stamp() == self._stamp:
+            return self._data
+        with self._lock:
+            stamp = self._file_stamp()
+            if self._data is None or stamp != self._stamp:
+                self._data = _bootstrap_admin(_read_admin())
+                self._stamp = self._file_stamp()
+            return self._data
+
+    def set(self, admin_data):
+        self._data = admin_data
+        self._stamp = self._file_stamp()
+
+admin_record = AdminRecord()
+
+def load_admin():
+    """Load admin credentials (cached, see AdminRecord)."""
+    return admin_record.get()
 
 def save_admin(admin_data):
     """Save admin credentials to JSON file."""
-    try:
-        admin_file = os.path.join(basedir, ADMIN_DB_FILE)
-        with open(admin_file, 'w', encoding='utf-8') as f:
-            json.dump(admin_data, f, indent=4, ensure_ascii=False)
+    if sqlite_storage:
+        if not sqlite_storage.save_admin(admin_data):
+            return False
+        admin_record.set(admin_data)
         return True
+    try:
+        atomic_write_json(os.path.join(basedir, ADMIN_DB_FILE), admin_data, indent=4)
     except Exception as e:
         print(f"Error saving admin: {e}")
         return False
+    admin_record.set(admin_data)
+    return True
 
 def get_admin_by_email(email):
     """Get admin by email."""
@@ -93,9 +896,10 @@ def get_admin_by_email(email):
         return admin_data
     return None
 
-def verify_admin_password(email, password):
-    """Verify admin password."""
-    admin = get_admin_by_email(email)
+def verify_admin_password(email, password, admin=None):
+    """Verify admin password. Pass admin to skip looking it up again."""
+    if admin is None:
+        admin = get_admin_by_email(email)
     if not admin:
         return False
     
@@ -112,7 +916,7 @@ def verify_admin_password(email, password):
     )
     
     if is_hashed:
-        return check_password_hash(admin_password, password)
+        return verify_password(admin_password, password)
     else:
         # Plain text comparison (for backward compatibility)
         return admin_password == password
@@ -123,65 +927,976 @@ JSON_DB_FILE = 'users_db.json'
 TASKS_DB_FILE = 'tasks_db.json'
 ADMIN_DB_FILE = 'admin_db.json'
 
+# ================= DURABLE FILE WRITES =================
+def atomic_write_json(path, data, indent, pin=False):
+    """Write data as JSON to path so readers never see a partial file.
+
+    The data goes to a temp file that is fsync'ed and then os.replace()d
+    over path. Returns the (mtime, size, inode) stamp of the new file; with
+    pin=True returns (stamp, file), the new file opened for reading.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pinned = None
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        if pin:
+            pinned = open(tmp_path, 'rb')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if pinned is not None:
+            pinned.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    try:
+        # Persist the rename itself
+        dir_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass  # Directories can't be fsync'ed on every platform
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    return (stamp, pinned) if pin else stamp
+
+
+class GroupCommit:
+    """Coalesces durable writes of one file issued close together.
+
+    Callers change the in-memory state first and then call commit(). The
+    first caller becomes the leader: it waits `window` seconds for others to
+    join, then runs `write` once, which persists everything changed so far.
+    Everyone who joined before the write started returns (or raises) with
+    its result, so N form submits within a few milliseconds cost one fsync.
+    Callers that arrive while a write is running are covered by the next
+    one even with no window, which is all sync workers can use.
+    """
+
+    def __init__(self, write, window):
+        self.write = write
+        self.window = window
+        self._cond = threading.Condition()
+        self._requested = 0
+        self._committed = 0
+        self._failed = (0, None)
+        self._leading = False
+
+    def commit(self):
+        with self._cond:
+            self._requested += 1
+            ticket = self._requested
+            while True:
+                if self._committed >= ticket:
+                    return
+                if self._failed[0] >= ticket:
+                    raise self._failed[1]
+                if not self._leading:
+                    self._leading = True
+                    break
+                self._cond.wait()
+        covered = ticket
+        try:
+            if self.window:
+                time.sleep(self.window)
+            with self._cond:
+                covered = self._requested
+            self.write()
+        except BaseException as e:
+            with self._cond:
+                self._leading = False
+                self._failed = (covered, e)
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._leading = False
+            self._committed = covered
+            self._cond.notify_all()
+
+
+# ================= JSON FILE STORES =================
+class VersionConflict(Exception):
+    """A record changed after the version the caller based its write on."""
+
+class JsonFileStore:
+    """In-process copy of one JSON database file.
+
+    The parsed file is kept in memory and only re-read when its mtime, size
+    or inode change, so reads are dictionary hits instead of a json.load()
+    per call. The file the cache reflects is kept open so its inode can't be
+    recycled by a later os.replace() with the same size and (coarse) mtime.
+    Subclasses maintain secondary indexes through the _index_* hooks.
+
+    In journaled mode (JSON_JOURNAL) a change appends one compact record to
+    '<file>.log' instead of rewriting the whole file; readers replay new log
+    records onto their cached copy, and a background compactor periodically
+    folds the log back into the base file. Log records set fields (or delete
+    a key), so replaying them onto a base that already contains them is
+    harmless.
+
+    Every record carries a 'version' counter that apply() bumps. apply()
+    can compare-and-swap on it: the check runs under an exclusive flock
+    against the latest committed state of all workers, so stale writers get
+    VersionConflict instead of silently overwriting each other.
+    """
+
+    def __init__(self, path, name, indent, journal=False):
+        self.path = path
+        self.log_path = path + '.log'
+        self.name = name
+        self.indent = indent
+        self.journal = journal
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._log_offset = 0
+        self._data = {}
+        self._pinned = None
+        self._lock_file = None
+        self._lock_pid = None
+        self._lock_depth = 0
+        self._batch_open = False   # Non-journal: holding the flock for a pending write
+        self._batch_dirty = False
+        self._batch_error = None   # [exception or None], shared by the writers of the open batch
+        self._compactor_pid = None
+        self._compact_event = threading.Event()
+        self._base_commit = GroupCommit(self._write_cached_base, GROUP_COMMIT_WINDOW)
+        self._log_commit = GroupCommit(self._fsync_log, GROUP_COMMIT_WINDOW)
+
+    @staticmethod
+    def _file_stamp(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    # ---------- indexes (overridden by subclasses) ----------
+    def _reset_index(self):
+        pass
+
+    def _index_add(self, key, record):
+        pass
+
+    def _index_remove(self, key, record):
+        pass
+
+    def _reindex(self):
+        self._reset_index()
+        for key, record in self._data.items():
+            self._index_add(key, record)
+
+    # ---------- cross-process locking ----------
+    def _acquire_file_lock(self, shared):
+        """flock() on '<file>.lock'. Callers must hold self._lock.
+
+        Re-entrant: a nested acquisition keeps the mode of the outer one.
+        """
+        if fcntl is None:
+            return
+        if self._lock_pid != os.getpid():
+            # Never share a lock descriptor with a forked parent
+            self._lock_file = open(self.path + '.lock', 'a+')
+            self._lock_pid = os.getpid()
+            self._lock_depth = 0
+        if self._lock_depth == 0:
+            fcntl.flock(self._lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        self._lock_depth += 1
+
+    def _release_file_lock(self):
+        if fcntl is None:
+            return
+        self._lock_depth -= 1
+        if self._lock_depth == 0:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _file_lock(self, shared):
+        self._acquire_file_lock(shared)
+        try:
+            yield
+        finally:
+            self._release_file_lock()
+
+    # ---------- reading ----------
+    def _apply_change(self, key, fields):
+        old = self._data.get(key)
+        if old is not None:
+            self._index_remove(key, old)
+        if fields is None:
+            self._data.pop(key, None)
+            return
+        record = dict(old or {})
+        record.update(fields)
+        self._data[key] = record
+        self._index_add(key, record)
+
+    def _replay_log(self):
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            size = 0
+        if size < self._log_offset:
+            # Log was reset without the base changing; start over
+            self._stamp = None
+            return self._refresh()
+        if size == self._log_offset:
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            chunk = f.read(size - self._log_offset)
+        # Only consume complete lines; a writer may be mid-append
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return
+        for line in chunk[:end].splitlines():
+            if line:
+                change = json.loads(line)
+                self._apply_change(change['k'], change['v'])
+        self._log_offset += end + 1
+
+    def _pin(self, f):
+        if self._pinned is not None:
+            self._pinned.close()
+        self._pinned = f
+
+    def _refresh(self):
+        stamp = self._file_stamp(self.path)
+        if stamp != self._stamp:
+            data = {}
+            if stamp is not None:
+                try:
+                    f = open(self.path, 'rb')
+                except OSError:
+                    f = None  # Deleted since the stat
+                if f is not None:
+                    try:
+                        st = os.fstat(f.fileno())
+                        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+                        data = json.loads(f.read().decode('utf-8'))
+                    except Exception as e:
+                        f.close()
+                        # Keep serving the last good copy; retry on the next call
+                        print(f"Error loading {self.name}: {e}")
+                        return
+                    self._pin(f)
+            self._data = data
+            self._stamp = stamp
+            self._log_offset = 0
+            self._reindex()
+        if self.journal:
+            self._replay_log()
+
+    def refresh(self):
+        """Bring the cached copy up to date with the file (and its log)."""
+        with self._lock:
+            if not self.journal:
+                # Base files are replaced atomically; no lock needed to read
+                self._refresh()
+                return
+            with self._file_lock(shared=True):
+                self._refresh()
+
+    def load(self):
+        """Return a copy of all records."""
+        self.refresh()
+        with self._lock:
+            return {key: dict(record) for key, record in self._data.items()}
+
+    def get(self, key, refresh=True):
+        """Return a copy of one record, or None."""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            record = self._data.get(key)
+            return dict(record) if record is not None else None
+
+    def keys(self):
+        self.refresh()
+        with self._lock:
+            return list(self._data)
+
+    def find(self, filters=None, refresh=True):
+        """Return copies of the records whose fields equal every filter value."""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return [
+                dict(record) for record in self._data.values()
+                if not filters or all(record.get(k) == v for k, v in filters.items())
+            ]
+
+    # ---------- writing ----------
+    def _write_base(self, data):
+        stamp, pinned = atomic_write_json(self.path, data, self.indent, pin=True)
+        self._pin(pinned)
+        return stamp
+
+    def _write_cached_base(self):
+        with self._lock:
+            try:
+                if self._batch_dirty:
+                    self._stamp = self._write_base(self._data)
+            except Exception as e:
+                self._stamp = None  # Cache no longer matches disk; reload it
+                # Writers that joined after the leader's ticket lose their change too
+                self._batch_error[0] = e
+                raise
+            finally:
+                self._close_batch()
+
+    def _open_batch(self):
+        """Join this process's pending write, or start one.
+
+        The batch holds the exclusive flock until its group commit writes
+        the file, so version checks made in it see every committed write.
+        """
+        if not self._batch_open:
+            self._acquire_file_lock(shared=False)
+            self._batch_open = True
+            self._batch_error = [None]
+            self._refresh()
+
+    def _close_batch(self):
+        if self._batch_open:
+            self._batch_open = False
+            self._batch_dirty = False
+            self._release_file_lock()
+
+    def _fsync_log(self):
+        fd = os.open(self.log_path, os.O_WRONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _adopt(self, data, stamp):
+        self._data = {key: dict(record) for key, record in data.items()}
+        self._stamp = stamp
+        self._log_offset = 0
+        self._reindex()
+
+    def save(self, data):
+        """Replace the whole database with data."""
+        try:
+            with self._lock, self._file_lock(shared=False):
+                stamp = self._write_base(data)
+                if self.journal and os.path.exists(self.log_path):
+                    os.truncate(self.log_path, 0)
+                self._adopt(data, stamp)
+            return True
+        except Exception as e:
+            print(f"Error saving {self.name}: {e}")
+            return False
+
+    def _check_versions(self, expected):
+        for key, version in (expected or {}).items():
+            current = self._data.get(key)
+            # None means the record must not exist
+            if (None if current is None else current.get('version', 0)) != version:
+                raise VersionConflict(f"{self.name} {key} changed")
+
+    def _versioned(self, changes):
+        versioned = {}
+        for key, fields in changes.items():
+            if fields is None:
+                versioned[key] = None
+                continue
+            # A renamed record brings its version along in fields
+            current = self._data.get(key) or fields
+            versioned[key] = {**fields, 'version': current.get('version', 0) + 1}
+        return versioned
+
+    def apply(self, changes, expected=None):
+        """Apply {key: fields-to-set or None-to-delete} and persist it.
+
+        expected maps keys to the version the caller read (None: must not
+        exist); if any differs, nothing is written and VersionConflict is
+        raised.
+        """
+        try:
+            with self._lock:
+                if self.journal:
+                    with self._file_lock(shared=False):
+                        self._refresh()
+                        self._check_versions(expected)
+                        changes = self._versioned(changes)
+                        payload = ''.join(
+                            json.dumps({'k': key, 'v': fields}, ensure_ascii=False, separators=(',', ':')) + '\n'
+                            for key, fields in changes.items()
+                        ).encode('utf-8')
+                        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                        try:
+                            os.write(fd, payload)
+                            log_size = os.fstat(fd).st_size
+                        finally:
+                            os.close(fd)
+                    # Our records are replayed again on the next refresh,
+                    # which is a no-op; other workers' records are picked up too
+                    for key, fields in changes.items():
+                        self._apply_change(key, fields)
+                    self._start_compactor()
+                    if log_size > JOURNAL_MAX_BYTES:
+                        self._compact_event.set()
+                else:
+                    self._open_batch()
+                    try:
+                        self._check_versions(expected)
+                    except VersionConflict:
+                        if not self._batch_dirty:
+                            self._close_batch()  # Nobody else is waiting on it
+                        raise
+                    for key, fields in self._versioned(changes).items():
+                        self._apply_change(key, fields)
+                    self._batch_dirty = True
+                    batch_error = self._batch_error
+            # Outside self._lock so concurrent writers can join the commit
+            if self.journal:
+                self._log_commit.commit()
+            else:
+                self._base_commit.commit()
+                # The batch may have failed under an earlier leader
+                if batch_error[0] is not None:
+                    raise batch_error[0]
+            return True
+        except VersionConflict:
+            raise
+        except Exception as e:
+            print(f"Error saving {self.name}: {e}")
+            return False
+
+    # ---------- compaction ----------
+    def compact(self):
+        """Fold the journal into the base file and truncate the journal."""
+        try:
+            with self._lock, self._file_lock(shared=False):
+                self._refresh()
+                if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0:
+                    return
+                self._stamp = self._write_base(self._data)
+                os.truncate(self.log_path, 0)
+                self._log_offset = 0
+        except Exception as e:
+            print(f"Error compacting {self.name}: {e}")
+
+    def _start_compactor(self):
+        if self._compactor_pid == os.getpid():
+            return
+        self._compactor_pid = os.getpid()
+        threading.Thread(target=self._compact_loop, name=f"{self.name}-compactor", daemon=True).start()
+
+    def _compact_loop(self):
+        while True:
+            self._compact_event.wait(JOURNAL_COMPACT_INTERVAL)
+            self._compact_event.clear()
+            self.compact()
+
+
+def login_key(identifier):
+    """Normalize a sign-in identifier: lower-cased email or bare 10-digit mobile."""
+    identifier = (identifier or '').strip()
+    if '@' in identifier:
+        return 'email:' + identifier.lower()
+    digits = re.sub(r'\D', '', identifier)
+    if len(digits) > 10 and (digits.startswith('91') or digits.startswith('0')):
+        digits = digits[-10:]  # +91 / leading 0 prefixes
+    return 'mobile:' + digits if digits else None
+
+USER_SORT_FIELDS = ('username', 'created_at', 'dob')
+USERS_PAGE_SIZE = 50
+TASKS_PAGE_SIZE = 50
+
+def user_sort_key(username, user_info, field):
+    """(value, username) position of a user in the given sort order."""
+    value = username if field == 'username' else user_info.get(field)
+    return (str(value or ''), username)
+
+class UserStore(JsonFileStore):
+    """users_db.json with hash indexes on email and mobile.
+
+    The users dict itself is keyed by username, so all three login
+    identifiers resolve with dictionary lookups. _by_login is the
+    credential index: login_key() of every email and mobile -> username.
+
+    For the admin user list there are filter sets (gender, admins,
+    reported) and, built on first use after a change, sorted orders per
+    USER_SORT_FIELDS and a sorted name list for prefix search; page()
+    serves one keyset-paginated slice from them.
+    """
+
+    def __init__(self, path, journal=False):
+        super().__init__(path, 'users', indent=2, journal=journal)
+        self._reset_index()
+
+    def _reset_index(self):
+        self._by_email = {}
+        self._by_mobile = {}
+        self._by_login = {}
+        self._by_gender = {}
+        self._admins = set()
+        self._reported = set()
+        self._orders = {}   # sort field -> sorted [(value, username)]
+        self._names = None  # sorted [(lower-cased name, username)]
+
+    def _login_keys(self, user_info):
+        keys = (login_key(user_info.get('email')), login_key(user_info.get('mobile')))
+        return [key for key in keys if key]
+
+    def _index_add(self, username, user_info):
+        # First match wins, same as the old linear scan
+        self._by_email.setdefault(user_info.get('email'), username)
+        self._by_mobile.setdefault(user_info.get('mobile'), username)
+        for key in self._login_keys(user_info):
+            self._by_login.setdefault(key, username)
+        self._by_gender.setdefault(user_info.get('gender') or '', set()).add(username)
+        if user_info.get('is_admin'):
+            self._admins.add(username)
+        if user_info.get('reported'):
+            self._reported.add(username)
+        self._orders = {}
+        self._names = None
+
+    def _index_remove(self, username, user_info):
+        if self._by_email.get(user_info.get('email')) == username:
+            del self._by_email[user_info.get('email')]
+        if self._by_mobile.get(user_info.get('mobile')) == username:
+            del self._by_mobile[user_info.get('mobile')]
+        for key in self._login_keys(user_info):
+            if self._by_login.get(key) == username:
+                del self._by_login[key]
+        gender = user_info.get('gender') or ''
+        self._by_gender[gender].discard(username)
+        if not self._by_gender[gender]:
+            del self._by_gender[gender]
+        self._admins.discard(username)
+        self._reported.discard(username)
+        self._orders = {}
+        self._names = None
+
+    def _order(self, field):
+        if field not in self._orders:
+            self._orders[field] = sorted(
+                user_sort_key(username, info, field) for username, info in self._data.items()
+            )
+        return self._orders[field]
+
+    def _name_matches(self, prefix):
+        if self._names is None:
+            self._names = sorted(
+                (str(name).lower(), username)
+                for username, info in self._data.items()
+                for name in {username, info.get('first_name') or '', info.get('last_name') or ''} if name
+            )
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._names, (prefix,))
+        matches = set()
+        for name, username in itertools.islice(self._names, start, None):
+            if not name.startswith(prefix):
+                break
+            matches.add(username)
+        return matches
+
+    def _user_candidates(self, filters):
+        """Return the smallest set of usernames that can match, or None for all users."""
+        plans = []
+        if 'gender' in filters:
+            plans.append(self._by_gender.get(filters['gender'] or '', set()))
+        if filters.get('is_admin'):
+            plans.append(self._admins)
+        if filters.get('reported'):
+            plans.append(self._reported)
+        if filters.get('name_prefix'):
+            plans.append(self._name_matches(filters['name_prefix']))
+        if not plans:
+            return None
+        return min(plans, key=len)
+
+    def _user_matches(self, username, filters):
+        if 'gender' in filters and username not in self._by_gender.get(filters['gender'] or '', ()):
+            return False
+        if 'is_admin' in filters and (username in self._admins) != filters['is_admin']:
+            return False
+        if 'reported' in filters and (username in self._reported) != filters['reported']:
+            return False
+        if filters.get('name_prefix'):
+            prefix = filters['name_prefix'].lower()
+            info = self._data[username]
+            names = (username, info.get('first_name') or '', info.get('last_name') or '')
+            if not any(str(name).lower().startswith(prefix) for name in names):
+                return False
+        return True
+
+    def usernames_with_prefix(self, prefix, limit, refresh=True):
+        """Up to limit usernames starting with prefix, in order."""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            order = self._order('username')
+            start = bisect.bisect_left(order, (prefix,))
+            names = []
+            for _, username in itertools.islice(order, start, None):
+                if not username.startswith(prefix) or len(names) == limit:
+                    break
+                names.append(username)
+            return names
+
+    def page(self, filters=None, sort='username', descending=False, after=None, limit=50, refresh=True):
+        """One page of users in sort order, starting after the cursor `after`.
+
+        Returns (users, cursor of the last user or None when this was the
+        last page). Small filter sets are sorted directly; otherwise the
+        cached sort order is walked from the cursor, so a page costs
+        O(log n + rows skipped by the filters).
+        """
+        filters = filters or {}
+        if refresh:
+            self.refresh()
+        with self._lock:
+            candidates = self._user_candidates(filters)
+            if candidates is not None and len(candidates) < len(self._data) // 8:
+                order = sorted(user_sort_key(u, self._data[u], sort) for u in candidates)
+            else:
+                order = self._order(sort)
+            if descending:
+                end = bisect.bisect_left(order, tuple(after)) if after else len(order)
+                walk = (order[i] for i in range(end - 1, -1, -1))
+            else:
+                start = bisect.bisect_right(order, tuple(after)) if after else 0
+                walk = itertools.islice(order, start, None)
+            page = []
+            for key in walk:
+                if self._user_matches(key[1], filters):
+                    if len(page) == limit:
+                        return [self._user(u) for _, u in page], list(page[-1])
+                    page.append(key)
+            return [self._user(u) for _, u in page], None
+
+    def _user(self, username):
+        user_info = self._data.get(username)
+        if user_info is None:
+            return None
+        return {'id': username, 'username': username, **user_info}
+
+    def get_by_username(self, username, refresh=True):
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return self._user(username)
+
+    def get_by_email(self, email, refresh=True):
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return self._user(self._by_email.get(email))
+
+    def get_by_mobile(self, mobile, refresh=True):
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return self._user(self._by_mobile.get(mobile))
+
+    def get_by_login(self, identifier, refresh=True):
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return self._user(self._by_login.get(login_key(identifier)))
+
+class TaskStore(JsonFileStore):
+    """tasks_db.json with secondary indexes for query_tasks.
+
+    Tasks are indexed by status and by assigned_to -> (active_for_user,
+    completed), the filters used by the task pages. find() picks whichever
+    index yields the fewest candidates for the given filters and only checks
+    those, so a user's task page costs O(that user's tasks).
+    """
+
+    def __init__(self, path, journal=False):
+        super().__init__(path, 'tasks', indent=4, journal=journal)
+        self._reset_index()
+
+    def _reset_index(self):
+        self._by_status = {}
+        self._by_assignee = {}
+        self._ordered_ids = None  # All ids in _id_order, built on first use after a change
+        self._created_ids = None  # All ids in _created_order, likewise
+
+    def _index_add(self, task_id, task_info):
+        self._ordered_ids = self._created_ids = None
+        self._by_status.setdefault(task_info.get('status'), set()).add(task_id)
+        state = (task_info.get('active_for_user'), task_info.get('completed'))
+        self._by_assignee.setdefault(task_info.get('assigned_to'), {}).setdefault(state, set()).add(task_id)
+
+    def _index_remove(self, task_id, task_info):
+        self._ordered_ids = self._created_ids = None
+        status = task_info.get('status')
+        self._by_status[status].discard(task_id)
+        if not self._by_status[status]:
+            del self._by_status[status]
+        assigned_to = task_info.get('assigned_to')
+        state = (task_info.get('active_for_user'), task_info.get('completed'))
+        states = self._by_assignee[assigned_to]
+        states[state].discard(task_id)
+        if not states[state]:
+            del states[state]
+            if not states:
+                del self._by_assignee[assigned_to]
+
+    def _candidates(self, filters):
+        """Return the smallest set of task ids that can match, or None for a full scan."""
+        plans = []
+        if 'status' in filters:
+            plans.append(self._by_status.get(filters['status'], set()))
+        if 'assigned_to' in filters:
+            states = self._by_assignee.get(filters['assigned_to'], {})
+            matching = [
+                ids for (active, completed), ids in states.items()
+                if ('active_for_user' not in filters or active == filters['active_for_user'])
+                and ('completed' not in filters or completed == filters['completed'])
+            ]
+            plans.append(matching[0] if len(matching) == 1 else set().union(*matching))
+        if not plans:
+            return None
+        return min(plans, key=len)
+
+    @staticmethod
+    def _id_order(task_id):
+        # Numeric order: '2' < '10'. Not creation order: each worker takes
+        # ids from its own block of TASK_ID_BLOCK_SIZE, so they interleave
+        return (len(task_id), task_id)
+
+    def _created_order(self, task_id):
+        return (self._data[task_id].get('created_at') or '', self._id_order(task_id))
+
+    def page(self, filters=None, after=None, limit=50, refresh=True):
+        """Tasks in id order after task id `after`.
+
+        Returns (tasks, id of the last task or None when this was the last
+        page); only the ids up to the end of the page are visited.
+        """
+        filters = filters or {}
+        if refresh:
+            self.refresh()
+        with self._lock:
+            candidates = self._candidates(filters)
+            if candidates is not None:
+                ordered = sorted(candidates, key=self._id_order)
+            else:
+                if self._ordered_ids is None:
+                    self._ordered_ids = sorted(self._data, key=self._id_order)
+                ordered = self._ordered_ids
+            start = 0
+            if after is not None:
+                start = bisect.bisect_right(ordered, self._id_order(str(after)), key=self._id_order)
+            tasks = []
+            for task_id in itertools.islice(ordered, start, None):
+                record = self._data[task_id]
+                if all(record.get(k) == v for k, v in filters.items()):
+                    if len(tasks) == limit:
+                        return tasks, tasks[-1]['id']
+                    tasks.append(dict(record))
+            return tasks, None
+
+    def scan(self, filters=None, newest_first=False, refresh=True):
+        """Yield matching tasks one at a time, in id order or newest (created_at) first.
+
+        Only the id list is taken up front; each record is copied as it is
+        reached, so a caller streaming a page holds one task at a time.
+        """
+        filters = filters or {}
+        if refresh:
+            self.refresh()
+        order = self._created_order if newest_first else self._id_order
+        with self._lock:
+            candidates = self._candidates(filters)
+            if candidates is not None:
+                ordered = sorted(candidates, key=order)
+            elif newest_first:
+                if self._created_ids is None:
+                    self._created_ids = sorted(self._data, key=order)
+                ordered = self._created_ids  # Replaced, never mutated, on change
+            else:
+                if self._ordered_ids is None:
+                    self._ordered_ids = sorted(self._data, key=order)
+                ordered = self._ordered_ids
+        for task_id in (reversed(ordered) if newest_first else ordered):
+            with self._lock:
+                record = self._data.get(task_id)
+                if record is None or not all(record.get(k) == v for k, v in filters.items()):
+                    continue
+                task = dict(record)
+            yield task
+
+    def find(self, filters=None, refresh=True):
+        if not filters:
+            return super().find(refresh=refresh)
+        if refresh:
+            self.refresh()
+        with self._lock:
+            candidates = self._candidates(filters)
+            if candidates is None:
+                records = self._data.values()
+            else:
+                records = (self._data[task_id] for task_id in sorted(candidates, key=self._id_order))
+            return [
+                dict(record) for record in records
+                if all(record.get(k) == v for k, v in filters.items())
+            ]
+
+class IdSequence:
+    """Monotonic, never-reused IDs backed by a persisted high-water mark.
+
+    The sequence file holds the first ID nobody has reserved yet. Each
+    process reserves a block of IDs under an exclusive flock and hands them
+    out from memory, so workers touch the file once per block instead of
+    contending on every insert. IDs left in a block when a worker exits are
+    skipped, never reused.
+    """
+
+    def __init__(self, path, block_size, existing_ids):
+        self.path = path
+        self.block_size = block_size
+        self._existing_ids = existing_ids  # Seeds a missing sequence file
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = 0
+        self._end = 0
+
+    def _highest_existing(self):
+        return max((int(i) for i in self._existing_ids() if str(i).isdigit()), default=0)
+
+    def _reserve_block(self, minimum=0):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+', encoding='utf-8') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)  # Released when the file closes
+            text = f.read().strip()
+            if text:
+                start = max(int(text), minimum)
+            else:
+                start = max(self._highest_existing() + 1, minimum)
+            f.seek(0)
+            f.write(str(start + self.block_size))
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        self._pid = os.getpid()
+        self._next = start
+        self._end = start + self.block_size
+
+    def next_id(self):
+        with self._lock:
+            # A forked child must not hand out its parent's block
+            if self._pid != os.getpid() or self._next >= self._end:
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+            return str(value)
+
+    def skip_existing(self):
+        """Move the sequence past every existing ID, after it handed out a taken one.
+
+        Happens when the data got ahead of the sequence file (a restored
+        backup, save_tasks() with higher IDs); the current block is dropped.
+        """
+        with self._lock:
+            self._reserve_block(minimum=self._highest_existing() + 1)
+
+CAS_RETRIES = 10  # Attempts for update_user / update_task before giving up
+CAS_BACKOFF = 0.005  # seconds; jittered and growing with each retry
+JOURNAL_COMPACT_INTERVAL = app.config['JOURNAL_COMPACT_INTERVAL']
+JOURNAL_MAX_BYTES = 4 * 1024 * 1024  # Compact early once a log grows past this
+GROUP_COMMIT_WINDOW = app.config['GROUP_COMMIT_WINDOW']
+
+user_store = UserStore(DB_FILE, journal=app.config['JSON_JOURNAL'])
+task_store = TaskStore(os.path.join(basedir, TASKS_DB_FILE), journal=app.config['JSON_JOURNAL'])
+task_ids = IdSequence(task_store.path + '.seq', app.config['TASK_ID_BLOCK_SIZE'], task_store.keys)
+
 # Simple Database Functions
 def load_users():
     """Load users from JSON file."""
-    if os.path.exists(DB_FILE):
-        try:
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading users: {e}")
-            return {}
-    return {}
+    if sqlite_storage:
+        return sqlite_storage.load_users()
+    return user_store.load()
 
 def save_users(users_data):
     """Save users to JSON file."""
     try:
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users_data, f, indent=2, ensure_ascii=False)
-        return True
-    except Exception as e:
-        print(f"Error saving users: {e}")
-        return False
+        if sqlite_storage:
+            return sqlite_storage.save_users(users_data)
+        return user_store.save(users_data)
+    finally:
+        profile_cache.clear()
 
 def get_user_by_email(email):
     """Get user by email."""
-    users_data = load_users()
-    for username, user_info in users_data.items():
-        if user_info.get('email') == email:
-            return {'username': username, **user_info}
-    return None
+    if sqlite_storage:
+        return sqlite_storage.get_user_by_email(email)
+    return user_store.get_by_email(email)
 
 def get_user_by_username(username):
     """Get user by username."""
-    users_data = load_users()
-    if username in users_data:
-        return {'username': username, **users_data[username]}
-    return None
+    if sqlite_storage:
+        return sqlite_storage.get_user_by_username(username)
+    return user_store.get_by_username(username)
 
 def get_user_by_mobile(mobile):
     """Get user by mobile number."""
-    users_data = load_users()
-    for username, user_info in users_data.items():
-        if user_info.get('mobile') == mobile:
-            return {'username': username, **user_info}
-    return None
+    if sqlite_storage:
+        return sqlite_storage.get_user_by_mobile(mobile)
+    return user_store.get_by_mobile(mobile)
+
+def query_users(filters=None, sort='username', descending=False, after=None, limit=50):
+    """One page of users for the admin list.
+
+    filters may hold gender, is_admin, reported and name_prefix; sort is
+    one of USER_SORT_FIELDS. Returns (users, cursor for the next page or None).
+    """
+    if sqlite_storage:
+        return sqlite_storage.query_users(filters, sort, descending, after, limit)
+    return user_store.page(filters, sort, descending, after, limit)
+
+def find_usernames(prefix, limit=20):
+    """Usernames starting with prefix, in order (for assignee typeahead)."""
+    if sqlite_storage:
+        return sqlite_storage.usernames_with_prefix(prefix, limit)
+    return user_store.usernames_with_prefix(prefix, limit)
+
+def get_user_by_login(identifier):
+    """Get user by any sign-in identifier (email or mobile, normalized)."""
+    if sqlite_storage:
+        return sqlite_storage.get_user_by_login(identifier)
+    return user_store.get_by_login(identifier)
+
+def find_user_by_email(email):
+    """Get the user an email belongs to, ignoring case as sign-in does."""
+    email = (email or '').strip()
+    if '@' not in email:
+        return get_user_by_email(email)
+    return get_user_by_login(email)
+
+def resolve_login(identifier):
+    """Resolve a sign-in identifier to (admin, user); either may be None."""
+    key = login_key(identifier)
+    admin = load_admin()
+    if not (key and admin and key == login_key(admin.get('email'))):
+        admin = None
+    return admin, get_user_by_login(identifier)
 
 def create_user(username, email, password, mobile=None, first_name=None, last_name=None, dob=None, gender=None, profile_photo=None):
     """Create a new user."""
-    users_data = load_users()
-    if username in users_data:
+    if get_user_by_username(username):
         return False  # Username already exists
     
-    # Check if email already exists
-    for existing_username, user_info in users_data.items():
-        if user_info.get('email') == email:
-            return False  # Email already exists
+    # Check if email already exists (in any letter case)
+    if find_user_by_email(email):
+        return False  # Email already exists
     
-    users_data[username] = {
+    user_info = {
         'email': email,
-        'password': generate_password_hash(password),
+        'password': hash_password(password),
         'mobile': mobile or '',
         'first_name': first_name or '',
         'last_name': last_name or '',
@@ -191,100 +1906,1026 @@ def create_user(username, email, password, mobile=None, first_name=None, last_na
         'is_admin': False,  # New users are not admin by default
         'created_at': datetime.utcnow().isoformat()
     }
-    return save_users(users_data)
+    if sqlite_storage:
+        return sqlite_storage.create_user(username, user_info)
+    try:
+        return user_store.apply({username: user_info}, expected={username: None})
+    except VersionConflict:
+        return False  # Username was taken in the meantime
+
+def get_user_by_id(user_id):
+    """Get user by ID (the username is the user ID)."""
+    return get_user_by_username(user_id)
+
+def update_user(username, updates, expected_version=None):
+    """Update fields of a user. A 'username' key renames the user.
+
+    updates is a dict, or a function user -> dict (None to skip the update).
+    The write is a compare-and-swap on the user's version: with
+    expected_version it returns False if the user changed since that
+    version was read; otherwise it is retried against the latest record.
+    """
+    for attempt in range(CAS_RETRIES):
+        user = get_user_by_username(username)
+        if user is None:
+            return False
+        version = user.get('version', 0)
+        if expected_version is not None and version != expected_version:
+            return False
+        fields = updates(user) if callable(updates) else updates
+        if fields is None:
+            return False
+        fields = dict(fields)
+        try:
+            if sqlite_storage:
+                return sqlite_storage.update_user(username, fields, version)
+            new_username = fields.pop('username', username) or username
+            if new_username == username:
+                return user_store.apply({username: fields}, expected={username: version})
+            if user_store.get(new_username) is not None:
+                return False  # Username already exists
+            user_info = {k: v for k, v in user.items() if k not in ('id', 'username')}
+            user_info.update(fields)
+            return user_store.apply(
+                {username: None, new_username: user_info},
+                expected={username: version, new_username: None}
+            )
+        except VersionConflict:
+            if expected_version is not None:
+                return False
+            time.sleep(random.uniform(0, CAS_BACKOFF * (attempt + 1)))
+        finally:
+            # After the write, so a concurrent reader can't re-cache the old record
+            profile_cache.invalidate(user.get('email'), fields.get('email'))
+    return False
 
 def update_user_password(username, new_password):
     """Update user password."""
-    users_data = load_users()
-    if username in users_data:
-        users_data[username]['password'] = generate_password_hash(new_password)
-        return save_users(users_data)
-    return False
+    return update_user(username, {'password': hash_password(new_password)})
 
 def update_user_admin_status(username, is_admin):
     """Update user admin status."""
-    users_data = load_users()
-    if username in users_data:
-        users_data[username]['is_admin'] = is_admin
-        return save_users(users_data)
-    return False
+    return update_user(username, {'is_admin': is_admin})
+
+def delete_user_record(username):
+    """Delete a user."""
+    user = get_user_by_username(username)
+    try:
+        if sqlite_storage:
+            return sqlite_storage.delete_user(username)
+        if user is None:
+            return False
+        return user_store.apply({username: None})
+    finally:
+        if user is not None:
+            profile_cache.invalidate(user.get('email'))
+
+# ================= USER PROFILE CACHE =================
+class ProfileCache:
+    """Short-TTL cache of user records by email, for per-request identity lookups.
+
+    Routes resolve session['user_email'] to a user on every request; this
+    serves repeats from memory. update_user, delete_user_record and
+    save_users invalidate entries after writing, and the TTL bounds how
+    stale a write made by another worker can be.
+    """
+
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # email -> (loaded_at, user)
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+        if entry is not None and now - entry[0] <= self.ttl:
+            return dict(entry[1])
+        user = get_user_by_email(email)
+        if user is not None:
+            with self._lock:
+                self._entries[email] = (now, user)
+                self._entries.move_to_end(email)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            user = dict(user)
+        return user
+
+    def invalidate(self, *emails):
+        with self._lock:
+            for email in emails:
+                self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+profile_cache = ProfileCache(app.config['PROFILE_CACHE_TTL'])
+
+# ================= OTP STORE =================
+class OtpStore:
+    """Password-reset OTPs and lockouts, keyed by email.
+
+    Entries are {'otp': sha256 of the code, 'expires', 'failed', 'lock_until'}
+    (epoch seconds). A timing wheel of one-second slots schedules each entry
+    at its deadline; every call advances the wheel and drops what has
+    expired, so purging costs O(1) amortized. An expired OTP is kept for
+    lock_time more, so verify() can still report 'expired' and the failed
+    count carries over to the next OTP. With a path the entries are
+    kept in a JsonFileStore instead of a dict, so they survive restarts and
+    are shared by all workers.
+    """
+
+    def __init__(self, ttl, lock_time, max_attempts, path=None, wheel_size=1024):
+        self.ttl = ttl.total_seconds()
+        self.lock_time = lock_time.total_seconds()
+        self.max_attempts = max_attempts
+        self._entries = {}
+        self._store = JsonFileStore(path, 'OTPs', indent=2) if path else None
+        self._lock = threading.RLock()
+        self._wheel = [set() for _ in range(wheel_size)]
+        self._tick = int(time.time())
+
+    @staticmethod
+    def _digest(otp):
+        return hashlib.sha256(otp.encode('utf-8')).hexdigest()
+
+    def _deadline(self, entry):
+        return max((entry.get('expires') or 0) + self.lock_time, entry.get('lock_until') or 0)
+
+    def _schedule(self, email, deadline):
+        with self._lock:
+            # Never into a tick that was already visited, or the entry would
+            # wait a full revolution; a deadline later this second goes in the next one
+            tick = max(int(deadline), self._tick + 1)
+            self._wheel[tick % len(self._wheel)].add(email)
+
+    def _advance(self, now):
+        due = []
+        with self._lock:
+            # Visit each elapsed slot once; a long idle gap covers the whole wheel
+            ticks = min(int(now) - self._tick, len(self._wheel))
+            for tick in range(int(now) - ticks + 1, int(now) + 1):
+                slot = self._wheel[tick % len(self._wheel)]
+                due.extend(slot)
+                slot.clear()
+            self._tick = int(now)
+        for email in due:
+            entry = self._get(email)
+            if entry is None:
+                continue
+            if self._deadline(entry) > now:
+                self._schedule(email, self._deadline(entry))  # More than one revolution away
+                continue
+            self._update(email, lambda entry: (None, None) if entry and self._deadline(entry) <= now
+                         else (entry, None), now)
+
+    def _get(self, email):
+        if self._store:
+            return self._store.get(email)
+        entry = self._entries.get(email)
+        return dict(entry) if entry is not None else None
+
+    def _update(self, email, change, now):
+        """Apply change(entry) -> (new entry or None, result) atomically."""
+        with self._lock:
+            for attempt in range(CAS_RETRIES):
+                entry = self._get(email)
+                new_entry, result = change(entry)
+                if new_entry == entry:
+                    return result
+                if not self._store:
+                    if new_entry is None:
+                        self._entries.pop(email, None)
+                    else:
+                        self._entries[email] = new_entry
+                else:
+                    try:
+                        version = entry.get('version', 0) if entry is not None else None
+                        self._store.apply({email: new_entry}, expected={email: version})
+                    except VersionConflict:
+                        continue  # Another worker changed it; re-read
+                if new_entry is not None and self._deadline(new_entry) > now:
+                    self._schedule(email, self._deadline(new_entry))
+                return result
+        return None
+
+    def issue(self, email):
+        """Create a new OTP for email. Returns it, or None while locked out."""
+        now = time.time()
+        self._advance(now)
+        otp = generate_otp()
+
+        def change(entry):
+            entry = entry or {'failed': 0, 'lock_until': 0}
+            if entry.get('lock_until', 0) > now:
+                return entry, None
+            # failed attempts carry over, so re-requesting doesn't reset them
+            return {**entry, 'otp': self._digest(otp), 'expires': now + self.ttl}, otp
+
+        return self._update(email, change, now)
+
+    def verify(self, email, otp):
+        """Check otp. Returns 'ok', 'invalid', 'expired' or 'locked'."""
+        now = time.time()
+        self._advance(now)
+
+        def change(entry):
+            if not entry or not entry.get('otp'):
+                return entry, 'invalid'
+            if entry.get('lock_until', 0) > now:
+                return entry, 'locked'
+            if entry.get('expires', 0) < now:
+                return entry, 'expired'
+            if secrets.compare_digest(entry['otp'], self._digest(otp)):
+                return entry, 'ok'
+            failed = entry.get('failed', 0) + 1
+            if failed >= self.max_attempts:
+                return {**entry, 'otp': None, 'failed': 0, 'lock_until': now + self.lock_time}, 'locked'
+            return {**entry, 'failed': failed}, 'invalid'
+
+        return self._update(email, change, now)
+
+    def clear(self, email):
+        """Forget email's OTP once it has been used."""
+        now = time.time()
+        self._update(email, lambda entry: (None, None), now)
+
+otp_store = OtpStore(OTP_TTL, LOCK_TIME, MAX_ATTEMPTS, app.config['OTP_STORE_PATH'] or None)
 
 # ================= TASK DATABASE FUNCTIONS =================
 def load_tasks():
     """Load tasks from the JSON database file."""
-    tasks_file = os.path.join(basedir, TASKS_DB_FILE)
-    if not os.path.exists(tasks_file):
-        return {}
-    try:
-        with open(tasks_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading tasks: {e}")
-        return {}
+    if sqlite_storage:
+        return sqlite_storage.load_tasks()
+    return task_store.load()
 
 def save_tasks(tasks_data):
     """Save tasks to the JSON database file."""
-    try:
-        tasks_file = os.path.join(basedir, TASKS_DB_FILE)
-        with open(tasks_file, 'w', encoding='utf-8') as f:
-            json.dump(tasks_data, f, indent=4, ensure_ascii=False)
-        return True
-    except Exception as e:
-        print(f"Error saving tasks: {e}")
-        return False
+    if sqlite_storage:
+        return sqlite_storage.save_tasks(tasks_data)
+    return task_store.save(tasks_data)
 
 def create_task(task_data):
     """Create a new task."""
-    tasks_data = load_tasks()
-    task_id = str(len(tasks_data) + 1)  # Simple ID generation
-    # Ensure unique ID
-    while task_id in tasks_data:
-        task_id = str(int(task_id) + 1)
-    
-    task_data['id'] = task_id
+    if sqlite_storage:
+        return sqlite_storage.create_task(task_data)
     task_data['created_at'] = datetime.utcnow().isoformat()
-    tasks_data[task_id] = task_data
-    if save_tasks(tasks_data):
-        return task_id
+    for attempt in range(CAS_RETRIES):
+        task_id = task_ids.next_id()
+        task_data['id'] = task_id
+        try:
+            # Must not exist: never merge a new task into an existing record
+            if task_store.apply({task_id: task_data}, expected={task_id: None}):
+                return task_id
+            return None
+        except VersionConflict:
+            print(f"Task ID {task_id} already in use; moving the ID sequence past existing tasks")
+            task_ids.skip_existing()
     return None
 
 def get_task_by_id(task_id):
     """Get task by ID."""
-    tasks_data = load_tasks()
-    task_id_str = str(task_id)
-    if task_id_str in tasks_data:
-        return tasks_data[task_id_str]
-    return None
+    if sqlite_storage:
+        return sqlite_storage.get_task_by_id(task_id)
+    return task_store.get(str(task_id))
 
 def query_tasks(filters=None):
     """Query tasks with optional filters."""
-    tasks_data = load_tasks()
-    tasks = []
-    
-    for task_id, task_info in tasks_data.items():
-        task_info['id'] = task_id
-        if filters:
-            match = True
-            for key, value in filters.items():
-                if task_info.get(key) != value:
-                    match = False
-                    break
-            if match:
-                tasks.append(task_info)
-        else:
-            tasks.append(task_info)
-    
-    return tasks
-
-def update_task(task_id, updates):
-    """Update a task."""
-    tasks_data = load_tasks()
-    task_id_str = str(task_id)
-    if task_id_str in tasks_data:
-        tasks_data[task_id_str].update(updates)
-        return save_tasks(tasks_data)
+    if sqlite_storage:
+        return sqlite_storage.query_tasks(filters)
+    return task_store.find(filters)
+
+def iter_tasks(filters=None, newest_first=False):
+    """Yield tasks one at a time, in id order or newest first, for streamed pages."""
+    if sqlite_storage:
+        return sqlite_storage.iter_tasks(filters, newest_first)
+    return task_store.scan(filters, newest_first)
+
+def query_tasks_page(filters=None, after=None, limit=50):
+    """One page of tasks in id order after task id `after`.
+
+    Returns (tasks, cursor for the next page or None).
+    """
+    if sqlite_storage:
+        return sqlite_storage.query_tasks_page(filters, after, limit)
+    return task_store.page(filters, after, limit)
+
+def update_task(task_id, updates, expected_version=None):
+    """Update a task.
+
+    updates is a dict, or a function task -> dict (None to skip the update).
+    The write is a compare-and-swap on the task's version: with
+    expected_version it returns False if the task changed since that
+    version was read; otherwise it is retried against the latest record.
+    """
+    for attempt in range(CAS_RETRIES):
+        task = get_task_by_id(task_id)
+        if task is None:
+            return False
+        version = task.get('version', 0)
+        if expected_version is not None and version != expected_version:
+            return False
+        fields = updates(task) if callable(updates) else updates
+        if fields is None:
+            return False
+        try:
+            return update_tasks({task_id: fields}, {task_id: version})
+        except VersionConflict:
+            if expected_version is not None:
+                return False
+            time.sleep(random.uniform(0, CAS_BACKOFF * (attempt + 1)))
     return False
 
+def update_tasks(changes, expected_versions=None):
+    """Update several tasks in one write. changes maps task ID -> updates.
+
+    Returns False if a task does not exist. With expected_versions
+    (task ID -> version read), raises VersionConflict and writes nothing if
+    any of those tasks changed since.
+    """
+    changes = {str(task_id): updates for task_id, updates in changes.items()}
+    expected = {str(task_id): version for task_id, version in (expected_versions or {}).items()}
+    if sqlite_storage:
+        return sqlite_storage.update_tasks(changes, expected)
+    if any(task_id not in expected and task_store.get(task_id) is None for task_id in changes):
+        return False
+    return task_store.apply(changes, expected=expected)
+
+def claim_task(task_id, assignee):
+    """Atomically assign an approved, unassigned task to assignee.
+
+    Returns who the task ends up assigned to: assignee if this call won,
+    the earlier claimant if someone got there first, or None if the task
+    does not exist or is not open for claiming.
+    """
+    claim = {
+        'assigned_to': assignee,
+        'status': 'accepted',
+        'active_for_user': False,  # goes to Pending Tasks
+        'completed': False
+    }
+    if sqlite_storage:
+        return sqlite_storage.claim_task(task_id, claim)
+    for attempt in range(CAS_RETRIES):
+        task = get_task_by_id(task_id)
+        if task is None:
+            return None
+        if task.get('assigned_to'):
+            return task['assigned_to']
+        if task.get('status') != 'approved':
+            return None
+        try:
+            return assignee if update_tasks({task_id: claim}, {task_id: task.get('version', 0)}) else None
+        except VersionConflict:
+            continue  # Re-read; usually someone else just claimed it
+    return None
+
+# ================= REQUEST UNIT OF WORK =================
+class RequestRepository:
+    """Request-scoped unit of work over the user and task databases.
+
+    Each JSON store is brought up to date at most once per request, lookups
+    are memoized, and task updates are collected and written in a single
+    flush when the request ends (see flush_repository). Reads made later
+    in the same request see the pending updates.
+    """
+
+    def __init__(self):
+        self._users_synced = False
+        self._tasks_synced = False
+        self._users = {}        # (field, value) -> user or None
+        self._tasks = {}        # task ID -> task or None, before pending updates
+        self._dirty_tasks = {}  # task ID -> fields to set at flush
+        self._checks = {}       # task ID -> conditions the task must still meet at flush
+
+    # ---------- users ----------
+    def _user(self, field, value):
+        key = (field, value)
+        if key not in self._users:
+            if field == 'email':
+                self._users[key] = profile_cache.get(value)
+            elif sqlite_storage:
+                lookup = {
+                    'email': sqlite_storage.get_user_by_email,
+                    'mobile': sqlite_storage.get_user_by_mobile,
+                    'username': sqlite_storage.get_user_by_username,
+                }[field]
+                self._users[key] = lookup(value)
+            else:
+                if not self._users_synced:
+                    user_store.refresh()
+                    self._users_synced = True
+                lookup = {
+                    'email': user_store.get_by_email,
+                    'mobile': user_store.get_by_mobile,
+                    'username': user_store.get_by_username,
+                }[field]
+                self._users[key] = lookup(value, refresh=False)
+        user = self._users[key]
+        return dict(user) if user is not None else None
+
+    def get_user_by_email(self, email):
+        return self._user('email', email)
+
+    def get_user_by_mobile(self, mobile):
+        return self._user('mobile', mobile)
+
+    def get_user_by_username(self, username):
+        return self._user('username', username)
+
+    # ---------- tasks ----------
+    def _sync_tasks(self):
+        if not self._tasks_synced:
+            task_store.refresh()
+            self._tasks_synced = True
+
+    def _with_changes(self, task):
+        return {**task, **self._dirty_tasks.get(task['id'], {})}
+
+    def get_task_by_id(self, task_id):
+        task_id = str(task_id)
+        if task_id not in self._tasks:
+            if sqlite_storage:
+                self._tasks[task_id] = sqlite_storage.get_task_by_id(task_id)
+            else:
+                self._sync_tasks()
+                self._tasks[task_id] = task_store.get(task_id, refresh=False)
+        task = self._tasks[task_id]
+        return self._with_changes(task) if task is not None else None
+
+    def query_tasks(self, filters=None):
+        if sqlite_storage:
+            tasks = sqlite_storage.query_tasks(filters)
+        else:
+            self._sync_tasks()
+            tasks = task_store.find(filters, refresh=False)
+        for task in tasks:
+            self._tasks.setdefault(task['id'], task)
+        if not self._dirty_tasks:
+            return tasks
+        # Pending updates can move tasks into or out of the result
+        seen = {task['id'] for task in tasks}
+        tasks += [self._tasks[task_id] for task_id in self._dirty_tasks if task_id not in seen]
+        tasks = [self._with_changes(task) for task in tasks]
+        tasks = [task for task in tasks if all(task.get(k) == v for k, v in (filters or {}).items())]
+        tasks.sort(key=lambda task: (len(task['id']), task['id']))
+        return tasks
+
+    def update_task(self, task_id, updates, check=None):
+        """Queue field updates for a task, to be written at flush.
+
+        check, if given, is the condition the route checked before making
+        the update, e.g. that the task is still assigned to the user. It is
+        tested again against the latest record if the flush has to retry.
+        """
+        task_id = str(task_id)
+        if self.get_task_by_id(task_id) is None:
+            return False
+        self._dirty_tasks.setdefault(task_id, {}).update(updates)
+        if check is not None:
+            self._checks.setdefault(task_id, []).append(check)
+        return True
+
+    def flush(self):
+        """Write all pending task updates at once.
+
+        The write is a compare-and-swap against the versions this request
+        read. If another request changed one of the tasks meanwhile, the
+        tasks are re-read and the checks passed to update_task() are tested
+        against the latest records. Only if they all still hold are the
+        same field updates applied again; otherwise the request's updates
+        are dropped together, since the route decided them together.
+        """
+        if not self._dirty_tasks:
+            return True
+        changes, self._dirty_tasks = self._dirty_tasks, {}
+        checks, self._checks = self._checks, {}
+        expected = {task_id: self._tasks[task_id].get('version', 0) for task_id in changes}
+        for attempt in range(CAS_RETRIES):
+            try:
+                return update_tasks(changes, expected)
+            except VersionConflict:
+                time.sleep(random.uniform(0, CAS_BACKOFF * (attempt + 1)))
+            latest = {task_id: get_task_by_id(task_id) for task_id in changes}
+            stale = sorted(task_id for task_id in changes
+                           if latest[task_id] is None
+                           or not all(check(latest[task_id]) for check in checks.get(task_id, ())))
+            if stale:
+                print(f"Error saving task updates {sorted(changes)}: tasks {stale} changed and no longer qualify")
+                return False
+            expected = {task_id: latest[task_id].get('version', 0) for task_id in changes}
+        print(f"Error saving task updates {sorted(changes)}: still conflicting after {CAS_RETRIES} attempts")
+        return False
+
+def get_repository():
+    """Return the unit of work bound to the current request."""
+    if 'repository' not in g:
+        g.repository = RequestRepository()
+    return g.repository
+
+@app.teardown_request
+def flush_repository(exc):
+    repository = g.pop('repository', None)
+    # Pending updates of a failed request are dropped, not half-written
+    if repository is not None and exc is None:
+        repository.flush()
+
+# ================= SQLITE STORAGE =================
+class SqliteStorage:
+    """SQLite implementation of the user, task and admin helpers.
+
+    Each record is stored as a JSON document next to the columns that are
+    looked up or filtered on, so a change is a single-row statement rather
+    than a rewrite of the whole database. Connections are per thread and run
+    in WAL mode so readers in other gunicorn workers are never blocked by a
+    writer. Selected with STORAGE_BACKEND=sqlite.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            email TEXT,
+            mobile TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+        CREATE INDEX IF NOT EXISTS idx_users_mobile ON users (mobile);
+        CREATE INDEX IF NOT EXISTS idx_users_login_email ON users (lower(email));
+        CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (coalesce(json_extract(data, '$.created_at'), ''), username);
+        CREATE INDEX IF NOT EXISTS idx_users_dob ON users (coalesce(json_extract(data, '$.dob'), ''), username);
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT,
+            assigned_to TEXT,
+            active_for_user INTEGER,
+            completed INTEGER,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+        CREATE INDEX IF NOT EXISTS idx_tasks_assignee
+            ON tasks (assigned_to, active_for_user, completed);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (coalesce(json_extract(data, '$.created_at'), ''), id);
+        CREATE TABLE IF NOT EXISTS admin (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            data TEXT NOT NULL
+        );
+    """
+    # Task fields mirrored into indexed columns
+    TASK_COLUMNS = ('status', 'assigned_to', 'active_for_user', 'completed')
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+        self._import_json()
+
+    def _conn(self):
+        # Writes are grouped with _transaction()
+        return sqlite_connection(self._local, self.path)
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _import_json(self):
+        """Seed empty tables from the JSON database files, if present."""
+        with self._transaction() as conn:
+            if conn.execute('SELECT 1 FROM users LIMIT 1').fetchone() is None and os.path.exists(DB_FILE):
+                with open(DB_FILE, 'r', encoding='utf-8') as f:
+                    self._insert_users(conn, json.load(f))
+            tasks_file = os.path.join(basedir, TASKS_DB_FILE)
+            if conn.execute('SELECT 1 FROM tasks LIMIT 1').fetchone() is None and os.path.exists(tasks_file):
+                with open(tasks_file, 'r', encoding='utf-8') as f:
+                    self._insert_tasks(conn, json.load(f))
+            # Without this the default admin would replace the configured one
+            admin_file = os.path.join(basedir, ADMIN_DB_FILE)
+            if conn.execute('SELECT 1 FROM admin').fetchone() is None and os.path.exists(admin_file):
+                with open(admin_file, 'r', encoding='utf-8') as f:
+                    conn.execute('INSERT INTO admin (id, data) VALUES (1, ?)',
+                                 (json.dumps(json.load(f), ensure_ascii=False),))
+
+    @staticmethod
+    def _column(value):
+        # Only scalars are mirrored into columns; anything else is matched in Python
+        if value is None or isinstance(value, (bool, int, str)):
+            return value
+        return None
+
+    # ---------- users ----------
+    def _insert_users(self, conn, users_data):
+        conn.executemany(
+            'INSERT INTO users (username, email, mobile, data) VALUES (?, ?, ?, ?)',
+            [(username, user_info.get('email'), user_info.get('mobile'), json.dumps(user_info, ensure_ascii=False))
+             for username, user_info in users_data.items()]
+        )
+
+    def _user_row(self, row):
+        if row is None:
+            return None
+        username, data = row
+        return {'id': username, 'username': username, **json.loads(data)}
+
+    def load_users(self):
+        rows = self._conn().execute('SELECT username, data FROM users ORDER BY rowid')
+        return {username: json.loads(data) for username, data in rows}
+
+    def save_users(self, users_data):
+        try:
+            with self._transaction() as conn:
+                conn.execute('DELETE FROM users')
+                self._insert_users(conn, users_data)
+            return True
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            return False
+
+    def get_user_by_email(self, email):
+        return self._user_row(self._conn().execute(
+            'SELECT username, data FROM users WHERE email = ? ORDER BY rowid LIMIT 1', (email,)).fetchone())
+
+    def get_user_by_username(self, username):
+        return self._user_row(self._conn().execute(
+            'SELECT username, data FROM users WHERE username = ?', (username,)).fetchone())
+
+    def get_user_by_mobile(self, mobile):
+        return self._user_row(self._conn().execute(
+            'SELECT username, data FROM users WHERE mobile = ? ORDER BY rowid LIMIT 1', (mobile,)).fetchone())
+
+    def query_users(self, filters=None, sort='username', descending=False, after=None, limit=50):
+        filters = filters or {}
+        sort_expr = 'username' if sort == 'username' else f"coalesce(json_extract(data, '$.{sort}'), '')"
+        where, params = [], []
+        if 'gender' in filters:
+            where.append("coalesce(json_extract(data, '$.gender'), '') = ?")
+            params.append(filters['gender'] or '')
+        for field in ('is_admin', 'reported'):
+            if field in filters:
+                where.append(f"coalesce(json_extract(data, '$.{field}'), 0) {'!=' if filters[field] else '='} 0")
+        if filters.get('name_prefix'):
+            pattern = re.sub(r'([%_\\])', r'\\\1', filters['name_prefix'].lower()) + '%'
+            where.append("(lower(username) LIKE ? ESCAPE '\\' OR lower(json_extract(data, '$.first_name')) LIKE ? ESCAPE '\\'"
+                         " OR lower(json_extract(data, '$.last_name')) LIKE ? ESCAPE '\\')")
+            params += [pattern] * 3
+        if after:
+            where.append(f"({sort_expr}, username) {'<' if descending else '>'} (?, ?)")
+            params += list(after)
+        direction = 'DESC' if descending else 'ASC'
+        rows = self._conn().execute(
+            f"SELECT username, data FROM users {'WHERE ' + ' AND '.join(where) if where else ''} "
+            f"ORDER BY {sort_expr} {direction}, username {direction} LIMIT ?",
+            params + [limit + 1]).fetchall()
+        users = [self._user_row(row) for row in rows[:limit]]
+        if len(rows) <= limit:
+            return users, None
+        last = users[-1]
+        return users, list(user_sort_key(last['username'], last, sort))
+
+    def usernames_with_prefix(self, prefix, limit):
+        rows = self._conn().execute(
+            'SELECT username FROM users WHERE username >= ? AND username < ? ORDER BY username LIMIT ?',
+            (prefix, prefix + '\U0010ffff', limit))
+        return [username for (username,) in rows]
+
+    def get_user_by_login(self, identifier):
+        key = login_key(identifier)
+        if not key:
+            return None
+        kind, value = key.split(':', 1)
+        if kind == 'email':
+            row = self._conn().execute(
+                'SELECT username, data FROM users WHERE lower(email) = ? ORDER BY rowid LIMIT 1', (value,)).fetchone()
+        else:
+            row = self._conn().execute(
+                'SELECT username, data FROM users WHERE mobile IN (?, ?) ORDER BY rowid LIMIT 1',
+                (value, identifier.strip())).fetchone()
+        return self._user_row(row)
+
+    def create_user(self, username, user_info):
+        try:
+            with self._transaction() as conn:
+                exists = conn.execute(
+                    'SELECT 1 FROM users WHERE username = ? OR lower(email) = ?',
+                    (username, (user_info.get('email') or '').strip().lower())).fetchone()
+                if exists:
+                    return False
+                self._insert_users(conn, {username: dict(user_info, version=1)})
+            return True
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            return False
+
+    def update_user(self, username, updates, expected_version=None):
+        try:
+            with self._transaction() as conn:
+                row = conn.execute('SELECT data FROM users WHERE username = ?', (username,)).fetchone()
+                if row is None:
+                    return False
+                user_info = json.loads(row[0])
+                version = user_info.get('version', 0)
+                if expected_version is not None and version != expected_version:
+                    raise VersionConflict(f"users {username} changed")
+                updates = dict(updates, version=version + 1)
+                new_username = updates.pop('username', username) or username
+                if new_username != username and conn.execute(
+                        'SELECT 1 FROM users WHERE username = ?', (new_username,)).fetchone():
+                    return False  # Username already exists
+                user_info.update(updates)
+                conn.execute(
+                    'UPDATE users SET username = ?, email = ?, mobile = ?, data = ? WHERE username = ?',
+                    (new_username, user_info.get('email'), user_info.get('mobile'),
+                     json.dumps(user_info, ensure_ascii=False), username)
+                )
+            return True
+        except VersionConflict:
+            raise
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            return False
+
+    def delete_user(self, username):
+        try:
+            with self._transaction() as conn:
+                return conn.execute('DELETE FROM users WHERE username = ?', (username,)).rowcount > 0
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            return False
+
+    # ---------- tasks ----------
+    def _insert_tasks(self, conn, tasks_data):
+        for task_id, task_info in tasks_data.items():
+            task_info = dict(task_info, id=str(task_id))
+            conn.execute(
+                'INSERT INTO tasks (id, status, assigned_to, active_for_user, completed, data) VALUES (?, ?, ?, ?, ?, ?)',
+                (int(task_id), *[self._column(task_info.get(col)) for col in self.TASK_COLUMNS],
+                 json.dumps(task_info, ensure_ascii=False))
+            )
+
+    def _write_task(self, conn, task_info):
+        conn.execute(
+            'UPDATE tasks SET status = ?, assigned_to = ?, active_for_user = ?, completed = ?, data = ? WHERE id = ?',
+            (*[self._column(task_info.get(col)) for col in self.TASK_COLUMNS],
+             json.dumps(task_info, ensure_ascii=False), int(task_info['id']))
+        )
+
+    def load_tasks(self):
+        rows = self._conn().execute('SELECT id, data FROM tasks ORDER BY id')
+        return {str(task_id): json.loads(data) for task_id, data in rows}
+
+    def save_tasks(self, tasks_data):
+        try:
+            with self._transaction() as conn:
+                conn.execute('DELETE FROM tasks')
+                self._insert_tasks(conn, tasks_data)
+            return True
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def create_task(self, task_data):
+        try:
+            with self._transaction() as conn:
+                # AUTOINCREMENT hands out IDs inside the write transaction and never reuses them
+                cursor = conn.execute("INSERT INTO tasks (data) VALUES ('{}')")
+                task_data['id'] = str(cursor.lastrowid)
+                task_data['created_at'] = datetime.utcnow().isoformat()
+                self._write_task(conn, dict(task_data, version=1))
+            return task_data['id']
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return None
+
+    def get_task_by_id(self, task_id):
+        try:
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            return None
+        row = self._conn().execute('SELECT data FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _task_rows(self, filters, after=None, newest_first=False):
+        """Iterate (filters-matching) tasks in id order, optionally after an id, or newest first."""
+        clauses = []
+        params = []
+        for key in self.TASK_COLUMNS:
+            if key not in filters:
+                continue
+            value = filters[key]
+            if value is None:
+                clauses.append(f'{key} IS NULL')
+            elif self._column(value) is not None:
+                clauses.append(f'{key} = ?')
+                params.append(value)
+        if after is not None:
+            clauses.append('id > ?')
+            params.append(int(after))
+        sql = 'SELECT data FROM tasks'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        if newest_first:
+            sql += " ORDER BY coalesce(json_extract(data, '$.created_at'), '') DESC, id DESC"
+        else:
+            sql += ' ORDER BY id'
+        for (data,) in self._conn().execute(sql, params):
+            task_info = json.loads(data)
+            # The columns only narrow the scan; the exact match is done here
+            if all(task_info.get(key) == value for key, value in filters.items()):
+                yield task_info
+
+    def query_tasks(self, filters=None):
+        return list(self._task_rows(filters or {}))
+
+    def iter_tasks(self, filters=None, newest_first=False):
+        return self._task_rows(filters or {}, newest_first=newest_first)
+
+    def query_tasks_page(self, filters=None, after=None, limit=50):
+        tasks = list(itertools.islice(self._task_rows(filters or {}, after), limit + 1))
+        if len(tasks) <= limit:
+            return tasks, None
+        return tasks[:limit], tasks[limit - 1]['id']
+
+    def update_tasks(self, changes, expected_versions=None):
+        expected_versions = expected_versions or {}
+        try:
+            with self._transaction() as conn:
+                tasks = {}
+                for task_id in changes:
+                    row = conn.execute('SELECT data FROM tasks WHERE id = ?', (int(task_id),)).fetchone()
+                    if row is None:
+                        return False  # Nothing written yet
+                    tasks[task_id] = json.loads(row[0])
+                    if task_id in expected_versions and tasks[task_id].get('version', 0) != expected_versions[task_id]:
+                        raise VersionConflict(f"tasks {task_id} changed")
+                for task_id, updates in changes.items():
+                    task_info = tasks[task_id]
+                    task_info.update(updates)
+                    task_info['id'] = str(task_id)
+                    task_info['version'] = task_info.get('version', 0) + 1
+                    self._write_task(conn, task_info)
+            return True
+        except VersionConflict:
+            raise
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def claim_task(self, task_id, claim):
+        try:
+            with self._transaction() as conn:
+                row = conn.execute('SELECT data FROM tasks WHERE id = ?', (int(task_id),)).fetchone()
+                if row is None:
+                    return None
+                task_info = json.loads(row[0])
+                if task_info.get('assigned_to'):
+                    return task_info['assigned_to']
+                if task_info.get('status') != 'approved':
+                    return None
+                task_info.update(claim)
+                task_info['version'] = task_info.get('version', 0) + 1
+                self._write_task(conn, task_info)
+            return claim['assigned_to']
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return None
+
+    # ---------- admin ----------
+    def load_admin(self):
+        row = self._conn().execute('SELECT data FROM admin WHERE id = 1').fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_admin(self, admin_data):
+        try:
+            with self._transaction() as conn:
+                conn.execute('INSERT OR REPLACE INTO admin (id, data) VALUES (1, ?)',
+                             (json.dumps(admin_data, ensure_ascii=False),))
+            return True
+        except Exception as e:
+            print(f"Error saving admin: {e}")
+            return False
+
+sqlite_storage = SqliteStorage(app.config['SQLITE_DB_PATH']) if app.config['STORAGE_BACKEND'] == 'sqlite' else None
+
+# Validate and hash the admin record once, at startup, instead of on every sign-in
+load_admin()
+
+# ================= STATIC BUNDLES =================
+BUNDLE_DIR = os.path.join(static_dir, 'bundles')
+BUNDLE_MIN_SIZE = 512  # Smaller blocks cost more as an extra request than they save
+BUNDLE_MAX_AGE = 365 * 24 * 3600  # seconds
+BUNDLE_BLOCK = re.compile(r'<(style|script)>(.*?)</\1>', re.S)
+
+def write_bundle(content, ext):
+    """Write content to static/bundles/<hash>.<ext> unless it is there, and return the name."""
+    name = f"{hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]}.{ext}"
+    path = os.path.join(BUNDLE_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(BUNDLE_DIR, exist_ok=True)
+        # Workers may race to write the same bundle; both write identical bytes
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    return name
+
+def extract_bundles(source):
+    """Replace the static <style>/<script> blocks of a template with links to bundles.
+
+    Blocks using Jinja syntax, or smaller than BUNDLE_MIN_SIZE, stay inline.
+    Blocks are dedented first, so the same CSS/JS in two templates shares one
+    file (and one cache entry in the browser).
+    """
+    def replace(match):
+        tag, body = match.group(1), textwrap.dedent(match.group(2)).strip() + '\n'
+        if len(body) < BUNDLE_MIN_SIZE or any(mark in body for mark in ('{{', '{%', '{#')):
+            return match.group(0)
+        try:
+            name = write_bundle(body, 'css' if tag == 'style' else 'js')
+        except OSError as e:
+            print(f"Error writing static bundle: {e}")
+            return match.group(0)
+        href = "{{ url_for('static_bundle', filename='%s') }}" % name
+        if tag == 'style':
+            return f'<link rel="stylesheet" href="{href}">'
+        return f'<script src="{href}"></script>'
+    return BUNDLE_BLOCK.sub(replace, source)
+
+@app.route('/static/bundles/<path:filename>')
+def static_bundle(filename):
+    # A bundle's name changes whenever its content does, so it can be cached for good
+    response = send_from_directory(BUNDLE_DIR, filename, max_age=BUNDLE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+# ================= TEMPLATE REGISTRY =================
+class TemplateRegistry:
+    """Compiled versions of the inline page templates.
+
+    render_template_string() compiles its source on every call; here each
+    source is compiled once per process (on first use) and the compiled
+    Template is reused. Compiled bytecode is also cached on disk so new
+    gunicorn workers skip the Jinja compile step entirely. With
+    STATIC_BUNDLES on, large inline CSS/JS is moved out to static bundles
+    before the source is compiled.
+    """
+
+    def __init__(self, env, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._sources = {}
+        self._compiled = {}
+        self._lock = threading.Lock()
+        # Shares Flask's globals and filters (url_for, session, ...); the
+        # '.html' names keep Flask's autoescaping on
+        self.env = env.overlay(
+            loader=FunctionLoader(self._load_source),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+        )
+
+    def _load_source(self, name):
+        source = self._sources.get(name)
+        if source is None:
+            return None
+        return source, None, lambda: True
+
+    def get(self, source):
+        template = self._compiled.get(source)
+        if template is None:
+            with self._lock:
+                template = self._compiled.get(source)
+                if template is None:
+                    name = f"inline/{hashlib.sha1(source.encode('utf-8')).hexdigest()}.html"
+                    self._sources[name] = extract_bundles(source) if app.config['STATIC_BUNDLES'] else source
+                    template = self._compiled[source] = self.env.get_template(name)
+        return template
+
+templates = TemplateRegistry(app.jinja_env, os.path.join(app.instance_path, 'jinja_cache'))
+
+def render_inline(source, **context):
+    """Like render_template_string(), but compiles the source only once."""
+    return render_template(templates.get(source), **context)
+
+# Template chunks (a few hundred bytes each) per flushed write
+STREAM_BUFFER_SIZE = 64
+
+def stream_inline(source, **context):
+    """Like render_inline(), but sends the page while it renders.
+
+    Iterables in the context are consumed as the template reaches them, so a
+    generator data source keeps one row in memory at a time. Output is
+    flushed every STREAM_BUFFER_SIZE template chunks rather than per chunk.
+    """
+    app.update_template_context(context)
+    stream = templates.get(source).stream(context)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    return app.response_class(stream_with_context(stream), mimetype='text/html')
+
 def calculate_age(dob_str):
     try:
         dob = datetime.strptime(dob_str, "%Y-%m-%d")
@@ -296,7 +2937,7 @@ def calculate_age(dob_str):
 # Home Page - Portfolio
 @app.route("/")
 def home():
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -523,7 +3164,7 @@ def home():
 # NeoLogin Home Page
 @app.route("/neologin")
 def neologin_home():
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -697,6 +3338,26 @@ def neologin_home():
     """)
 
 # Sign Up Page
+@app.route("/api/check-availability")
+def check_availability():
+    """Report whether an email, mobile and/or username is still free.
+
+    Answers from the user indexes, so the signup page no longer has to
+    embed every registered email.
+    """
+    repo = get_repository()
+    lookups = {
+        'email': find_user_by_email,
+        'mobile': repo.get_user_by_mobile,
+        'username': repo.get_user_by_username,
+    }
+    result = {}
+    for field, lookup in lookups.items():
+        value = request.args.get(field, '').strip()
+        if value:
+            result[field] = lookup(value) is None
+    return jsonify(result)
+
 @app.route("/signup", methods=["GET", "POST"])
 def signup():
     message = ""
@@ -738,13 +3399,14 @@ def signup():
         mobile_pattern = r'^[6-9]\d{9}$'
         # Check Firestore for existing users
         try:
-            mobile_exists = get_user_by_mobile(mobile) is not None
-            email_exists = get_user_by_email(email) is not None
-            username_exists = get_user_by_username(username) is not None
+            repo = get_repository()
+            mobile_exists = repo.get_user_by_mobile(mobile) is not None
+            email_exists = find_user_by_email(email) is not None
+            username_exists = repo.get_user_by_username(username) is not None
         except Exception as e:
             print(f"Firestore query error during signup validation: {e}")
             message = "Database error. Please try again later."
-            return render_template_string(r"""
+            return render_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -818,7 +3480,7 @@ def signup():
                     if get_user_by_username(username):
                         message = "Username already exists"
                         clear_username = True
-                    elif get_user_by_email(email):
+                    elif find_user_by_email(email):
                         message = "Email ID already exists"
                         clear_email = True
                     elif get_user_by_mobile(mobile):
@@ -826,11 +3488,13 @@ def signup():
                         clear_mobile = True
                     else:
                         message = "Registration failed. Please try again."
+            except HashQueueFull:
+                raise
             except Exception as e:
                 print(f"Error during signup: {e}")
                 message = f"Registration failed due to an error. Please try again. Error: {str(e)}"
 
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -1113,22 +3777,37 @@ def signup():
                 document.getElementById("eye2").textContent = "🛡️";
                 const mobileInput = document.getElementById('mobile');
                 const emailInput = document.querySelector('input[name="email"]');
-                const existingEmails = {{ users.values() | map(attribute='email') | list | tojson }};
+                const usernameInput = document.querySelector('input[name="username"]');
+                // Ask the server whether a value is taken instead of shipping every email in the page
+                function checkTaken(input, field, messageText) {
+                    const value = input.value.trim();
+                    if (!value) return;
+                    fetch("{{ url_for('check_availability') }}?" + field + "=" + encodeURIComponent(value))
+                        .then(function(r) { return r.json(); })
+                        .then(function(data) {
+                            if (data[field] === false && input.value.trim() === value) {
+                                alert(messageText);
+                                input.value = "";
+                                input.focus();
+                            }
+                        })
+                        .catch(function() {});  // The server re-checks on submit
+                }
                 mobileInput.addEventListener('blur', function() {
                     const mobilePattern = /^[6-9]\d{9}$/;
                     if (!mobilePattern.test(mobileInput.value) && mobileInput.value.length > 0) {
                         alert("Mobile number must be 10 digits and start with 6, 7, 8, or 9");
                         mobileInput.value = "";
                         mobileInput.focus();
+                        return;
                     }
+                    checkTaken(mobileInput, 'mobile', "This Mobile number is already registered!");
                 });
                 emailInput.addEventListener('blur', function() {
-                    const emailVal = emailInput.value.trim();
-                    if (existingEmails.includes(emailVal)) {
-                        alert("This Email ID is already registered!");
-                        emailInput.value = "";
-                        emailInput.focus();
-                    }
+                    checkTaken(emailInput, 'email', "This Email ID is already registered!");
+                });
+                usernameInput.addEventListener('blur', function() {
+                    checkTaken(usernameInput, 'username', "This Username is already taken!");
                 });
                 const dobInput = document.getElementById('dob');
                 if (dobInput) {
@@ -1234,9 +3913,29 @@ def signup():
     </body>
     </html>
     """, message=message, clear_mobile=clear_mobile, clear_email=clear_email, clear_password=clear_password,
-       clear_dob=clear_dob, clear_fname=clear_fname, clear_lname=clear_lname, clear_username=clear_username,
-       users=users)
+       clear_dob=clear_dob, clear_fname=clear_fname, clear_lname=clear_lname, clear_username=clear_username)
+
 
+def too_many_attempts(wait):
+    """429 page for a locked sign-in, with Retry-After in seconds."""
+    minutes = int(wait // 60) + 1
+    return render_inline(r"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Too Many Attempts - NeoLogin</title>
+        <style>
+            body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }
+            .error { color: #c0392b; font-size: 18px; }
+            a { color: #667eea; text-decoration: none; }
+        </style>
+    </head>
+    <body>
+        <div class="error">Too many sign-in attempts. Please try again in {{ minutes }} minute(s).</div>
+        <a href="{{ url_for('signin') }}">Go back to Sign In</a>
+    </body>
+    </html>
+    """, minutes=minutes), 429, {'Retry-After': str(int(wait) + 1)}
 
 # Sign In Page
 @app.route("/signin", methods=["GET", "POST"])
@@ -1245,7 +3944,7 @@ def signin():
 
     if session.get("logged_in"):
         email = session.get("user_email")
-        return render_template_string(r"""
+        return render_inline(r"""
         <script>
             alert("You are already logged in. Please logout first to access Sign In.");
             window.location.href = "{{ url_for('dashboard', email=email) }}";
@@ -1257,26 +3956,18 @@ def signin():
         identifier = request.form.get("identifier", "").strip()
         password = request.form.get("password", "").strip()
 
-        # Check if it's admin login first
-        admin = get_admin_by_email(identifier)
-        if admin and verify_admin_password(identifier, password):
-            # ✅ Admin login successful
-            session['logged_in'] = True
-            session['user_email'] = admin.get('email', '')
-            session['username'] = 'admin'
-            session['is_admin'] = True
-            return redirect(url_for('admin_menu'))
-        
-        # Check regular user login
+        # Throttle before touching storage or hashing anything
+        wait, ip_wait = login_throttle.attempt(identifier, request.remote_addr)
+        if wait:
+            return too_many_attempts(wait)
+
+        # One credential-index lookup resolves the admin email, a user email or a mobile
         try:
-            # Try email first, then mobile
-            user = get_user_by_email(identifier)
-            if not user:
-                user = get_user_by_mobile(identifier)
+            admin, user = resolve_login(identifier)
         except Exception as e:
             print(f"Database query error during signin: {e}")
             message = "Database error. Please try again later."
-            return render_template_string(r"""
+            return render_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -1294,6 +3985,17 @@ def signin():
     </html>
     """, message=message)
 
+        # Check if it's admin login first
+        if admin and verify_admin_password(admin.get('email', ''), password, admin):
+            login_throttle.succeeded(identifier, request.remote_addr)
+            # ✅ Admin login successful
+            rotate_session_id()
+            session['logged_in'] = True
+            session['user_email'] = admin.get('email', '')
+            session['username'] = 'admin'
+            session['is_admin'] = True
+            return redirect(url_for('admin_menu'))
+
         if user:
             # Password check
             password_valid = False
@@ -1315,13 +4017,15 @@ def signin():
                     
                     if is_hashed:
                         # Password is hashed, use check_password_hash (works with all werkzeug hash formats)
-                        password_valid = check_password_hash(user_password, password)
+                        password_valid = verify_password(user_password, password)
                     else:
                         # Password is plain text (old format), compare directly
                         password_valid = (user_password == password)
-                        # If login successful with plain text, hash it for future use
-                        if password_valid and username:
-                            update_user_password(username, password)
+                    # Plain text or outdated hash parameters: upgrade in the background
+                    if password_valid and username and (not is_hashed or needs_rehash(user_password)):
+                        rehash_password_later(username, user_password, password)
+            except HashQueueFull:
+                raise
             except Exception as e:
                 print(f"ERROR during password verification: {e}")
                 import traceback
@@ -1330,6 +4034,8 @@ def signin():
             
             if password_valid:
                 # ✅ Successful login
+                login_throttle.succeeded(identifier, request.remote_addr)
+                rotate_session_id()
                 session['logged_in'] = True
                 session['user_email'] = user.get('email', '')
                 session['username'] = user.get('username', '')
@@ -1342,7 +4048,11 @@ def signin():
         else:
             message = "Invalid email/mobile or password"
 
-    return render_template_string(r"""
+        # A locked client IP only lets correct passwords through
+        if ip_wait:
+            return too_many_attempts(ip_wait)
+
+    return render_inline(r"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -1632,59 +4342,50 @@ def forgot_password():
         # Find user
         user = get_user_by_email(email)
         if not user:
-            return render_template_string(r"""
+            return render_inline(r"""
                 <script>
                     alert("User not found!");
                     window.location.href = "/forgot-password";
                 </script>
             """)
 
-        # Check lock
-        lock_until = user.get('lock_until')
-        if lock_until:
-            now_utc = datetime.utcnow()
-            # Convert Firestore timestamp if needed
-            if hasattr(lock_until, 'to_datetime'):
-                lock_until = lock_until.to_datetime()
-            elif isinstance(lock_until, str):
-                lock_until = datetime.fromisoformat(lock_until.replace('Z', '+00:00'))
-            # Compare UTC times
-            if now_utc < lock_until:
-                return render_template_string(r"""
-                    <script>
-                        alert("Too many reset attempts. Try again after 10 minutes.");
-                        window.location.href = "/forgot-password";
-                    </script>
-                """)
-            else:
-                # Lock expired → reset
-                update_user(user['id'], {'failed_attempts': 0, 'lock_until': None})
+        # ✅ Generate OTP (kept in otp_store, not on the user record); None while locked
+        otp = otp_store.issue(user.get('email', ''))
+        if otp is None:
+            return render_inline(r"""
+                <script>
+                    alert("Too many reset attempts. Try again after 10 minutes.");
+                    window.location.href = "/forgot-password";
+                </script>
+            """)
 
-        # ✅ Generate OTP
-        import random
-        otp = str(random.randint(100000, 999999))
-        otp_expiration = datetime.utcnow() + timedelta(minutes=5)
-        update_user(user['id'], {'otp': otp, 'otp_expiration': otp_expiration})
+        # ✅ Email the OTP when mail is configured (queued, so SMTP never blocks the request)
+        if app.config['MAIL_PASSWORD']:
+            send_mail_async(
+                "NeoLogin password reset code",
+                [user.get('email', '')],
+                f"Your NeoLogin password reset code is {otp}. It expires in 5 minutes."
+            )
 
         # ✅ Save email in session for verification
         session['reset_email'] = user.get('email', '')
 
         # ✅ Show OTP directly on the page (old method)
-        return render_template_string(f"""
+        return render_inline(r"""
             <script>
-                var otp = prompt("Your OTP is: {otp}. Please enter it to verify:");
-                if (otp) {{
+                var otp = prompt("Your OTP is: {{ otp }}. Please enter it to verify:");
+                if (otp) {
                     // Redirect to verify-otp route with OTP as query param
                     window.location.href = "/verify-otp?entered_otp=" + otp;
-                }} else {{
+                } else {
                     alert("OTP entry cancelled.");
                     window.location.href = "/forgot-password";
-                }}
+                }
             </script>
-        """)
+        """, otp=otp)
 
     # GET request → show email input form
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -1888,22 +4589,26 @@ def verify_otp():
 
         pattern = r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*#?&]).{8,}$'
 
-        if user.otp != otp:
-            return render_template_string(r"""
+        otp_status = otp_store.verify(email, otp)
+        if otp_status == 'locked':
+            session.pop("reset_email", None)
+            return render_inline(r"""
+                <script>
+                    alert("Too many reset attempts. Try again after 10 minutes.");
+                    window.location.href = "/forgot-password";
+                </script>
+            """)
+
+        if otp_status == 'invalid':
+            return render_inline(r"""
                 <script>
                     alert("Invalid OTP!");
                     window.location.href = "/verify-otp";
                 </script>
             """)
 
-        otp_expiration = user.get('otp_expiration')
-        if otp_expiration:
-            if hasattr(otp_expiration, 'to_datetime'):
-                otp_expiration = otp_expiration.to_datetime()
-            elif isinstance(otp_expiration, str):
-                otp_expiration = datetime.fromisoformat(otp_expiration.replace('Z', '+00:00'))
-        if otp_expiration and datetime.utcnow() > otp_expiration:
-            return render_template_string(r"""
+        if otp_status == 'expired':
+            return render_inline(r"""
                 <script>
                     alert("OTP expired!");
                     window.location.href = "/forgot-password";
@@ -1911,7 +4616,7 @@ def verify_otp():
             """)
 
         if not re.match(pattern, password):
-            return render_template_string(r"""
+            return render_inline(r"""
                 <script>
                     alert("Password does not meet requirements!");
                     window.location.href = "/verify-otp";
@@ -1919,7 +4624,7 @@ def verify_otp():
             """)
 
         if password != confirm_password:
-            return render_template_string(r"""
+            return render_inline(r"""
                 <script>
                     alert("Passwords do not match!");
                     window.location.href = "/verify-otp";
@@ -1928,6 +4633,7 @@ def verify_otp():
 
         # Update password
         update_user_password(user.get('username', ''), password)
+        otp_store.clear(email)
         
         # Clear OTP from session
         session.pop('reset_otp', None)
@@ -1935,14 +4641,14 @@ def verify_otp():
 
         session.pop("reset_email", None)
 
-        return render_template_string(r"""
+        return render_inline(r"""
             <script>
                 alert("Password updated successfully!");
                 window.location.href = "/signin";
             </script>
         """)
 
-    return render_template_string(r"""
+    return render_inline(r"""
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -2201,20 +4907,100 @@ def verify_otp():
 </html>
 """, entered_otp=entered_otp)
 
+# ================= RESET TOKENS =================
+RESET_TOKEN_SALT = "password-reset-salt"
+RESET_TOKEN_MAX_AGE = 3600  # seconds
+
+@lru_cache(maxsize=8)
+def get_signer(secret_key, salt):
+    """URLSafeTimedSerializer for a key/salt pair, built once."""
+    return URLSafeTimedSerializer(secret_key, salt=salt)
+
+class UsedTokens:
+    """Bounded memory of spent single-use tokens.
+
+    Every token lives for the same max_age, so insertion order is expiry
+    order: expired entries are popped from the front, and lookups and
+    inserts are O(1). Tokens are stored as SHA-256 digests. With a path the
+    claims are kept in a JsonFileStore instead, so a token spent on one
+    worker is spent on all of them; claim() is then a must-not-exist
+    compare-and-swap.
+    """
+
+    def __init__(self, max_age, max_entries=100000, path=None):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> expires
+        self._store = JsonFileStore(path, 'used reset tokens', indent=2) if path else None
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._entries:
+            digest, expires = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) < self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _expire_stored(self, now):
+        # Claims are rare, so a scan of the (small) file per claim is fine
+        expired = {digest: None for digest in self._store.keys()
+                   if (self._store.get(digest, refresh=False) or {}).get('expires', 0) <= now}
+        if expired:
+            self._store.apply(expired)
+
+    def is_used(self, token):
+        now = time.time()
+        if self._store:
+            entry = self._store.get(self._digest(token))
+            return entry is not None and entry.get('expires', 0) > now
+        with self._lock:
+            self._expire(now)
+            return self._digest(token) in self._entries
+
+    def claim(self, token):
+        """Mark token as used. Returns False if it already was (or can't be recorded)."""
+        now = time.time()
+        digest = self._digest(token)
+        if self._store:
+            self._expire_stored(now)
+            try:
+                return self._store.apply({digest: {'expires': now + self.max_age}}, expected={digest: None})
+            except VersionConflict:
+                return False
+        with self._lock:
+            self._expire(now)
+            if digest in self._entries:
+                return False
+            self._entries[digest] = now + self.max_age
+            return True
+
+    def release(self, token):
+        """Forget a claim whose reset did not go through, so the link works again."""
+        digest = self._digest(token)
+        if self._store:
+            self._store.apply({digest: None})
+            return
+        with self._lock:
+            self._entries.pop(digest, None)
+
+used_reset_tokens = UsedTokens(RESET_TOKEN_MAX_AGE, path=app.config['RESET_TOKEN_STORE_PATH'] or None)
+
 @app.route("/reset-password/<token>", methods=["GET", "POST"])
 def reset_password(token):
-    from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
-    from werkzeug.security import generate_password_hash
-
-    s = URLSafeTimedSerializer(app.secret_key)
-
     try:
-        email = s.loads(token, salt="password-reset-salt", max_age=3600)
+        email = get_signer(app.secret_key, RESET_TOKEN_SALT).loads(token, max_age=RESET_TOKEN_MAX_AGE)
     except SignatureExpired:
         return "The reset link has expired."
     except BadSignature:
         return "Invalid reset link."
 
+    if used_reset_tokens.is_used(token):
+        return "This reset link has already been used."
+
     user = get_user_by_email(email)
     if not user:
         return "Invalid user."
@@ -2226,11 +5012,22 @@ def reset_password(token):
         if new_password != confirm_password:
             return "Passwords do not match."
 
-        # 🔹 Hash the password
-        hashed_password = generate_password_hash(new_password, method="sha256")
+        # Claim the link before hashing, so a replayed POST never hashes again
+        if not used_reset_tokens.claim(token):
+            return "This reset link has already been used."
 
-        # 🔹 Update Firestore
-        update_user(user['id'], {'password': hashed_password})
+        try:
+            # 🔹 Hash the password
+            hashed_password = hash_password(new_password)
+
+            # 🔹 Update Firestore
+            if not update_user(user['id'], {'password': hashed_password}):
+                used_reset_tokens.release(token)
+                return "Could not update the password. Please try again."
+        except Exception:
+            # The reset did not happen (e.g. HashQueueFull -> 503): keep the link usable
+            used_reset_tokens.release(token)
+            raise
 
         # Optional: update in-memory dictionary if you maintain one
         if user.get('username') in users:
@@ -2238,7 +5035,7 @@ def reset_password(token):
 
         return redirect(url_for("signin"))  # or show success message
 
-    return render_template_string(r"""
+    return render_inline(r"""
         <form method="POST">
             New Password: <input type="password" name="password" required><br>
             Confirm Password: <input type="password" name="confirm_password" required><br>
@@ -2267,9 +5064,9 @@ def remove_admin(user_id):
         return redirect(url_for("signin"))
     
     # Prevent removing yourself
-    users_data = load_users()
-    if user_id in users_data:
-        user_email = users_data[user_id].get('email', '')
+    user = get_user_by_username(user_id)
+    if user:
+        user_email = user.get('email', '')
         if user_email == session.get('user_email'):
             return redirect(url_for("view_users"))
     
@@ -2305,7 +5102,7 @@ def dashboard(email):
                 "profile_photo": ""
             }
             full_name = "Admin"
-            return render_template_string(r"""
+            return render_inline(r"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -2495,7 +5292,7 @@ def dashboard(email):
     """)
     
     # Get user from database
-    user_db = get_user_by_email(email)
+    user_db = get_repository().get_user_by_email(email)
     if not user_db:
         return redirect(url_for('signin'))
     
@@ -2525,7 +5322,7 @@ def dashboard(email):
         "profile_photo": profile_photo
     }
 
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -2973,7 +5770,7 @@ def view_tasks():
         }
     else:
         # Handle regular users
-        user_obj = get_user_by_email(user_email)
+        user_obj = get_repository().get_user_by_email(user_email)
         if not user_obj:
             return redirect(url_for("signin"))
     
@@ -3012,7 +5809,7 @@ def view_tasks():
         # Regular users can ONLY see approved tasks (pending tasks are hidden)
         tasks = query_tasks({'status': 'approved'})
 
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -3146,23 +5943,16 @@ def accept_task(task_id):
         return redirect(url_for("signin"))
 
     # 🔥 FIX: get user from DATABASE, not users dict
+    repo = get_repository()
     user_email = session.get("user_email")
-    user = get_user_by_email(user_email)
+    user = repo.get_user_by_email(user_email)
     if not user:
         return redirect(url_for("signin"))
 
-    task = get_task_by_id(str(task_id))
-
-    # Only approved & unassigned tasks can be accepted
-    if task and task.get('status') == "approved" and not task.get('assigned_to'):
-        user_identifier = user.get('username', user.get('email', ''))
-        update_task(task['id'], {
-            'assigned_to': user_identifier,
-            'status': 'accepted',
-            'active_for_user': False,  # goes to Pending Tasks
-            'completed': False
-        })
-
+    # Only approved & unassigned tasks can be accepted; the check and the
+    # assignment happen atomically, so only one of several users wins
+    user_identifier = user.get('username', user.get('email', ''))
+    claim_task(str(task_id), user_identifier)
 
     return redirect(url_for("view_tasks"))
 
@@ -3171,16 +5961,18 @@ def complete_task(task_id):
     if not session.get("logged_in"):
         return redirect(url_for("signin"))
 
+    repo = get_repository()
     user_email = session.get("user_email")
-    user = get_user_by_email(user_email)
+    user = repo.get_user_by_email(user_email)
     if not user:
         return redirect(url_for("signin"))
 
-    task = get_task_by_id(str(task_id))
+    task = repo.get_task_by_id(str(task_id))
 
     user_identifier = user.get('username', user.get('email', ''))
     if task and task.get('assigned_to') == user_identifier and not task.get('completed', False):
-        update_task(task['id'], {'completed': True, 'active_for_user': False})
+        repo.update_task(task['id'], {'completed': True, 'active_for_user': False},
+                         check=lambda t: t.get('assigned_to') == user_identifier and not t.get('completed', False))
 
     # 🔴 THIS is the fix
     return redirect(url_for("my_tasks"))
@@ -3190,19 +5982,20 @@ def my_tasks():
     if not session.get("logged_in"):
         return redirect(url_for("signin"))
 
+    repo = get_repository()
     user_email = session.get("user_email")
-    user_obj = get_user_by_email(user_email)
+    user_obj = repo.get_user_by_email(user_email)
     if not user_obj:
         return redirect(url_for("signin"))
     
     # Fetch tasks
     user_identifier = user_obj.get('username', user_obj.get('email', ''))
-    active_tasks = query_tasks({'assigned_to': user_identifier, 'active_for_user': True, 'completed': False})
+    active_tasks = repo.query_tasks({'assigned_to': user_identifier, 'active_for_user': True, 'completed': False})
     active_task = active_tasks[0] if active_tasks else None
-    pending_tasks = query_tasks({'assigned_to': user_identifier, 'active_for_user': False, 'completed': False})
-    completed_tasks = query_tasks({'assigned_to': user_identifier, 'completed': True})
+    pending_tasks = repo.query_tasks({'assigned_to': user_identifier, 'active_for_user': False, 'completed': False})
+    completed_tasks = repo.query_tasks({'assigned_to': user_identifier, 'completed': True})
 
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -3340,16 +6133,17 @@ def switch_task(task_id):
     if not session.get("logged_in"):
         return redirect(url_for("signin"))
 
+    repo = get_repository()
     user_email = session.get("user_email")
-    user = get_user_by_email(user_email)
+    user = repo.get_user_by_email(user_email)
     if not user:
         return redirect(url_for("signin"))
 
     user_identifier = user.get('username', user.get('email', ''))
-    current_active_tasks = query_tasks({'assigned_to': user_identifier, 'active_for_user': True, 'completed': False})
+    current_active_tasks = repo.query_tasks({'assigned_to': user_identifier, 'active_for_user': True, 'completed': False})
     current_active = current_active_tasks[0] if current_active_tasks else None
 
-    new_task = get_task_by_id(str(task_id))
+    new_task = repo.get_task_by_id(str(task_id))
 
     if not new_task:
         return redirect(url_for("my_tasks"))
@@ -3359,9 +6153,12 @@ def switch_task(task_id):
         return redirect(url_for("my_tasks"))
 
     if current_active:
-        update_task(current_active['id'], {'active_for_user': False})
+        repo.update_task(current_active['id'], {'active_for_user': False},
+                         check=lambda t: t.get('assigned_to') == user_identifier and t.get('active_for_user'))
 
-    update_task(new_task['id'], {'active_for_user': True})
+    assignee, completed = new_task.get('assigned_to'), new_task.get('completed', False)
+    repo.update_task(new_task['id'], {'active_for_user': True},
+                     check=lambda t: t.get('assigned_to') == assignee and t.get('completed', False) == completed)
     return redirect(url_for("my_tasks"))
 
 @app.route("/start-task/<int:task_id>")
@@ -3369,23 +6166,26 @@ def start_task(task_id):
     if not session.get("logged_in"):
         return redirect(url_for("signin"))
 
+    repo = get_repository()
     user_email = session.get("user_email")
-    user = get_user_by_email(user_email)
+    user = repo.get_user_by_email(user_email)
     if not user:
         return redirect(url_for("signin"))
 
     user_identifier = user.get('username', user.get('email', ''))
     # Deactivate current active task
-    current_tasks = query_tasks({'assigned_to': user_identifier, 'active_for_user': True, 'completed': False})
+    current_tasks = repo.query_tasks({'assigned_to': user_identifier, 'active_for_user': True, 'completed': False})
     current = current_tasks[0] if current_tasks else None
 
     if current:
-        update_task(current['id'], {'active_for_user': False})
+        repo.update_task(current['id'], {'active_for_user': False},
+                         check=lambda t: t.get('assigned_to') == user_identifier and t.get('active_for_user'))
 
     # Activate selected task
-    task = get_task_by_id(str(task_id))
+    task = repo.get_task_by_id(str(task_id))
     if task and task.get('assigned_to') == user_identifier and not task.get('completed', False):
-        update_task(task['id'], {'active_for_user': True})
+        repo.update_task(task['id'], {'active_for_user': True},
+                         check=lambda t: t.get('assigned_to') == user_identifier and not t.get('completed', False))
 
     return redirect(url_for("my_tasks"))
 
@@ -3401,14 +6201,14 @@ def post_task():
         reward = request.form.get("reward", "").strip()
 
         # For now: just confirm submission (no storage yet)
-        return render_template_string(r"""
+        return render_inline(r"""
         <script>
             alert("Task submitted successfully! Waiting for admin approval.");
             window.location.href = "/tasks";
         </script>
         """)
 
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -3498,7 +6298,7 @@ def update_profile_photo(email):
         return redirect(url_for('signin'))
 
     # Get user from JSON database
-    user_obj = get_user_by_email(email)
+    user_obj = get_repository().get_user_by_email(email)
     if not user_obj:
         return redirect(url_for('signin'))
 
@@ -3530,11 +6330,8 @@ def update_profile_photo(email):
                 print(f"Warning: Could not delete old photo {old_path}: {e}")
 
     # Update JSON database with profile photo filename
-    users_data = load_users()
     username = user_obj.get('username', '')
-    if username in users_data:
-        users_data[username]['profile_photo'] = filename
-        save_users(users_data)
+    update_user(username, {'profile_photo': filename})
     
     # Update in-memory dictionary if it exists
     if username in users:
@@ -3560,15 +6357,43 @@ def view_users():
     if not session.get("logged_in") or not session.get("is_admin"):
         return redirect(url_for("signin"))
 
-    # Get all users from JSON database
-    users_data = load_users()
-    all_users = []
-    for username, user_data in users_data.items():
-        user_data['id'] = username  # Use username as ID
-        user_data['username'] = username
-        all_users.append(user_data)
-
-    return render_template_string(r"""
+    # One page at a time: ?sort=username|created_at|age&order=asc|desc&gender=&role=admin|user&reported=1|0&q=name prefix&after=cursor
+    sort = request.args.get('sort', 'username')
+    if sort not in ('username', 'created_at', 'age'):
+        sort = 'username'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    filters = {}
+    if request.args.get('gender'):
+        filters['gender'] = request.args['gender']
+    if request.args.get('role') in ('admin', 'user'):
+        filters['is_admin'] = request.args['role'] == 'admin'
+    if request.args.get('reported') in ('1', '0'):
+        filters['reported'] = request.args['reported'] == '1'
+    if request.args.get('q', '').strip():
+        filters['name_prefix'] = request.args['q'].strip()
+    after = None
+    if request.args.get('after'):
+        try:
+            after = json.loads(base64.urlsafe_b64decode(request.args['after'].encode()))
+            if not (isinstance(after, list) and len(after) == 2 and all(isinstance(v, str) for v in after)):
+                after = None
+        except (ValueError, TypeError):
+            after = None
+
+    # Older first means earlier dates of birth
+    field = 'dob' if sort == 'age' else sort
+    descending = (order == 'desc') != (sort == 'age')
+    all_users, cursor = query_users(filters, field, descending, after, USERS_PAGE_SIZE)
+    # Ages are worked out as the rows are streamed
+    users = ({**u, 'age': calculate_age(u['dob']) if u.get('dob') else ''} for u in all_users)
+    next_url = None
+    if cursor:
+        args = request.args.to_dict()
+        args['after'] = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        next_url = url_for('view_users', **args)
+    first_url = url_for('view_users', **{k: v for k, v in request.args.items() if k != 'after'})
+
+    return stream_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -3702,6 +6527,37 @@ def view_users():
                 text-decoration: none;
                 font-weight: bold;
             }
+            .filter-bar {
+                display: flex;
+                flex-wrap: wrap;
+                gap: 8px;
+                margin-bottom: 16px;
+            }
+            .filter-bar input, .filter-bar select, .filter-bar button {
+                padding: 6px 10px;
+                border-radius: 6px;
+                border: 1px solid #ccc;
+            }
+            .filter-bar button {
+                background: #6f42c1;
+                color: white;
+                border: none;
+                cursor: pointer;
+            }
+            .pager {
+                display: flex;
+                justify-content: center;
+                gap: 16px;
+                margin-top: 16px;
+            }
+            .pager a {
+                background: #6f42c1;
+                color: white;
+                padding: 8px 18px;
+                border-radius: 8px;
+                text-decoration: none;
+                font-weight: bold;
+            }
         </style>
     </head>
     <body>
@@ -3709,6 +6565,35 @@ def view_users():
         <h2>Registered Users (Admin)</h2>
         <a class="logout" href="{{ url_for('logout') }}">Logout</a>
     </div>
+    <form method="GET" class="filter-bar">
+        <input type="text" name="q" placeholder="Name starts with…" value="{{ request.args.get('q', '') }}">
+        <select name="gender">
+            <option value="">Any gender</option>
+            {% for g in ['Male', 'Female', 'Other'] %}
+            <option value="{{ g }}" {% if request.args.get('gender') == g %}selected{% endif %}>{{ g }}</option>
+            {% endfor %}
+        </select>
+        <select name="role">
+            <option value="">Any role</option>
+            <option value="admin" {% if request.args.get('role') == 'admin' %}selected{% endif %}>Admins</option>
+            <option value="user" {% if request.args.get('role') == 'user' %}selected{% endif %}>Users</option>
+        </select>
+        <select name="reported">
+            <option value="">Reported or not</option>
+            <option value="1" {% if request.args.get('reported') == '1' %}selected{% endif %}>Reported</option>
+            <option value="0" {% if request.args.get('reported') == '0' %}selected{% endif %}>Not reported</option>
+        </select>
+        <select name="sort">
+            <option value="username" {% if sort == 'username' %}selected{% endif %}>Sort by username</option>
+            <option value="created_at" {% if sort == 'created_at' %}selected{% endif %}>Sort by sign-up date</option>
+            <option value="age" {% if sort == 'age' %}selected{% endif %}>Sort by age</option>
+        </select>
+        <select name="order">
+            <option value="asc" {% if order == 'asc' %}selected{% endif %}>Ascending</option>
+            <option value="desc" {% if order == 'desc' %}selected{% endif %}>Descending</option>
+        </select>
+        <button type="submit">Apply</button>
+    </form>
     <table>
         <tr>
             <th>ID</th>
@@ -3718,6 +6603,7 @@ def view_users():
             <th>Mobile </th>
             <th>Username (Edit)</th>
             <th>Gender (Edit)</th>
+            <th>Age</th>
             <th>Role</th>
             <th>Admin Action</th>
             <th>Edit</th>
@@ -3744,6 +6630,7 @@ def view_users():
         <td>
             {{ u.get('gender', 'Not set') }}
         </td>
+        <td>{{ u.get('age', '') }}</td>
         <!-- ROLE -->
         <td>
             {% if u.get('is_admin', False) %}
@@ -3779,10 +6666,21 @@ def view_users():
                 onclick="return confirm('Are you sure you want to delete this user?')">
                 ❌
             </a>
+            {% if config.SERVER_SESSIONS %}
+            <a href="{{ url_for('revoke_sessions', user_id=u.get('id', u.get('username', ''))) }}"
+                onclick="return confirm('Sign this user out of all sessions?')"
+                title="Sign out everywhere">
+                🔒
+            </a>
+            {% endif %}
         </td>
         </tr>
         {% endfor %}
     </table>
+    <div class="pager">
+        {% if request.args.get('after') %}<a href="{{ first_url }}">⏮ First page</a>{% endif %}
+        {% if next_url %}<a href="{{ next_url }}">Next page ▶</a>{% endif %}
+    </div>
     <script>
     function enableEdit(el) {
         const form = el.closest("form");
@@ -3795,7 +6693,7 @@ def view_users():
     </script>
     </body>
     </html>
-    """, users=all_users)
+    """, users=users, sort=sort, order=order, next_url=next_url, first_url=first_url)
 
 
 # ================= UPDATE USERNAME (ADMIN ONLY) =================
@@ -3883,8 +6781,7 @@ def update_recovery(user_id):
     if user:
         new_keyword = request.form.get("recovery_keyword", "").strip()
         if new_keyword:
-            from werkzeug.security import generate_password_hash
-            update_user(user['id'], {'recovery_keyword_hash': generate_password_hash(new_keyword)})
+            update_user(user['id'], {'recovery_keyword_hash': hash_password(new_keyword)})
     return redirect(url_for("view_users"))
 
 # ================= DELETE USER (ADMIN ONLY) =================
@@ -3894,10 +6791,8 @@ def delete_user(user_id):
         return redirect(url_for("signin"))
 
     # Delete from JSON database (user_id is username in JSON DB)
-    users_data = load_users()
-    if user_id in users_data:
-        users_data.pop(user_id, None)
-        save_users(users_data)
+    if delete_user_record(user_id):
+        revoke_user_sessions(user_id)
         # Remove from in-memory dict
         if user_id in users:
             users.pop(user_id, None)
@@ -3913,7 +6808,7 @@ def admin_menu():
     warning = session.pop("show_admin_warning", False)
 
     email = session.get("user_email")
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -4054,12 +6949,10 @@ def admin_tasks():
     if not session.get("logged_in") or not session.get("is_admin"):
         return redirect(url_for("signin"))
 
-    # Get all tasks from JSON database
-    all_tasks = query_tasks()
-    # Sort by created_at descending if available
-    all_tasks.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    # Newest (created_at) first, streamed from the store's ordered index
+    all_tasks = iter_tasks(newest_first=True)
 
-    return render_template_string(r"""
+    return stream_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -4178,34 +7071,34 @@ def admin_task_management():
             update_task(task['id'], {'status': 'approved'})
         return redirect(url_for("admin_task_management"))
 
-    # Show all tasks from JSON database
-    all_tasks = query_tasks()
-    tasks = []
-    for task in all_tasks:
-        task_data = task.copy()
-        # Get creator username
-        if task_data.get('created_by'):
-            creator_username = task_data['created_by']
-            task_data['creator'] = {'username': creator_username}
-        else:
-            task_data['creator'] = None
-        # Get assignee username
-        if task_data.get('assigned_to'):
-            assignee_username = task_data['assigned_to']
-            task_data['assignee'] = {'username': assignee_username}
-        else:
-            task_data['assignee'] = None
-        tasks.append(task_data)
-    
-    # Get all users for display
-    users_data = load_users()
-    users_list = []
-    for username, user_data in users_data.items():
-        user_data['id'] = username
-        user_data['username'] = username
-        users_list.append(user_data)
-
-    return render_template_string(r"""
+    # One page of tasks at a time: ?status=pending|approved|...&after=<last task id>
+    filters = {'status': request.args['status']} if request.args.get('status') else None
+    after = request.args.get('after')
+    if after is not None and not after.isdigit():
+        after = None
+    all_tasks, cursor = query_tasks_page(filters, after, TASKS_PAGE_SIZE)
+    next_url = None
+    if cursor:
+        next_url = url_for('admin_task_management', **{**request.args.to_dict(), 'after': cursor})
+    first_url = url_for('admin_task_management', **{k: v for k, v in request.args.items() if k != 'after'})
+    def with_people(tasks):
+        for task in tasks:
+            task_data = task.copy()
+            # Get creator username
+            if task_data.get('created_by'):
+                creator_username = task_data['created_by']
+                task_data['creator'] = {'username': creator_username}
+            else:
+                task_data['creator'] = None
+            # Get assignee username
+            if task_data.get('assigned_to'):
+                assignee_username = task_data['assigned_to']
+                task_data['assignee'] = {'username': assignee_username}
+            else:
+                task_data['assignee'] = None
+            yield task_data
+
+    return stream_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -4222,6 +7115,17 @@ def admin_task_management():
     </head>
     <body>
         <h2>Admin Task Management</h2>
+        <form method="GET" style="margin-bottom:12px;">
+            <select name="status">
+                <option value="">All statuses</option>
+                {% for s in ['pending', 'approved', 'accepted', 'completed'] %}
+                <option value="{{ s }}" {% if request.args.get('status') == s %}selected{% endif %}>{{ s|capitalize }}</option>
+                {% endfor %}
+            </select>
+            <button type="submit">Filter</button>
+        </form>
+        <!-- One shared list of suggestions for every assign box, filled as the admin types -->
+        <datalist id="assignee-options"></datalist>
         <table>
             <tr>
                 <th>ID</th>
@@ -4259,12 +7163,8 @@ def admin_task_management():
                     </form>
                     <!-- ASSIGN FORM -->
                     <form method="GET" action="{{ url_for('assign_task', task_id=t.get('id', '')) }}">
-                        <select name="user_id" required>
-                            <option value="">Assign to user</option>
-                            {% for u in users %}
-                                <option value="{{ u.get('id', '') }}">{{ u.get('username', '') }}</option>
-                            {% endfor %}
-                        </select>
+                        <input type="text" name="user_id" class="assignee-input" list="assignee-options"
+                               placeholder="Assign to user" autocomplete="off" required>
                     <button type="submit">Assign</button>
                 </form>
                 {% else %}
@@ -4274,24 +7174,53 @@ def admin_task_management():
             </tr>
             {% endfor %}
         </table>
+        <div style="margin-top:16px; display:flex; gap:16px; justify-content:center;">
+            {% if request.args.get('after') %}<a href="{{ first_url }}">⏮ First page</a>{% endif %}
+            {% if next_url %}<a href="{{ next_url }}">Next page ▶</a>{% endif %}
+        </div>
+        <script>
+            const assigneeOptions = document.getElementById('assignee-options');
+            let assigneeTimer = null;
+            document.querySelectorAll('.assignee-input').forEach(function(input) {
+                input.addEventListener('input', function() {
+                    clearTimeout(assigneeTimer);
+                    assigneeTimer = setTimeout(function() {
+                        fetch("{{ url_for('username_suggestions') }}?prefix=" + encodeURIComponent(input.value.trim()))
+                            .then(function(r) { return r.json(); })
+                            .then(function(names) {
+                                assigneeOptions.innerHTML = '';
+                                names.forEach(function(name) {
+                                    const option = document.createElement('option');
+                                    option.value = name;
+                                    assigneeOptions.appendChild(option);
+                                });
+                            })
+                            .catch(function() {});
+                    }, 150);
+                });
+            });
+        </script>
     </body>
     </html>
-    """, tasks=tasks, users=users_list)
+    """, tasks=with_people(all_tasks), next_url=next_url, first_url=first_url)
+
+@app.route("/api/usernames")
+def username_suggestions():
+    """Usernames starting with ?prefix=, for the assignee typeahead."""
+    if not session.get("logged_in") or not session.get("is_admin"):
+        return jsonify([]), 403
+    return jsonify(find_usernames(request.args.get('prefix', '').strip(), limit=20))
 
 @app.route("/assign-task/<task_id>")
 def assign_task(task_id):
     if not session.get("logged_in") or not session.get("is_admin"):
         return redirect(url_for("signin"))
 
-    user_id = request.args.get("user_id")
+    user_id = request.args.get("user_id", "").strip()
     task = get_task_by_id(str(task_id))
     
     # Get user by username (since JSON DB uses username as key)
-    users_data = load_users()
-    user = None
-    if user_id and user_id in users_data:
-        user = users_data[user_id]
-        user['username'] = user_id
+    user = get_user_by_username(user_id) if user_id else None
 
     if task and user:
         existing_active_tasks = query_tasks({'assigned_to': user['id'], 'active_for_user': True, 'completed': False})
@@ -4324,7 +7253,7 @@ def view_admins():
     is_admin_logged_in = session.get("is_admin", False)
     logged_in_email = session.get("user_email")
 
-    return render_template_string(r"""
+    return render_inline(r"""
     <!DOCTYPE html>
     <html>
     <head>